@@ -36,6 +36,8 @@ if 'bpy' in locals():
     reload(op_apply_as_decal)
     reload(op_delete_unused_image_datablocks)
     reload(op_delete_unused_material_datablocks)
+    reload(op_clear_probe_cache)
+    reload(op_memory_budget)
 
 import bpy
 
@@ -44,6 +46,8 @@ from io_import_images_as_planes_rewrite import op_arange_objects
 from io_import_images_as_planes_rewrite import op_apply_as_decal
 from io_import_images_as_planes_rewrite import op_delete_unused_image_datablocks
 from io_import_images_as_planes_rewrite import op_delete_unused_material_datablocks
+from io_import_images_as_planes_rewrite import op_clear_probe_cache
+from io_import_images_as_planes_rewrite import op_memory_budget
 
 
 def register():
@@ -52,6 +56,8 @@ def register():
     op_apply_as_decal.register()
     op_delete_unused_image_datablocks.register()
     op_delete_unused_material_datablocks.register()
+    op_clear_probe_cache.register()
+    op_memory_budget.register()
 
 def unregister():
     op_import_images.unregister()
@@ -59,6 +65,8 @@ def unregister():
     op_apply_as_decal.unregister()
     op_delete_unused_image_datablocks.unregister()
     op_delete_unused_material_datablocks.unregister()
+    op_clear_probe_cache.unregister()
+    op_memory_budget.unregister()
 
 
 if __name__ == "__main__":
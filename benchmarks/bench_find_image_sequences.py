@@ -0,0 +1,50 @@
+'''Benchmark find_image_sequences on a large synthetic directory listing
+
+Run with any Python 3 that has numpy, Blender is not needed:
+
+    python benchmarks/bench_find_image_sequences.py [number of files]
+'''
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util_sequences import find_image_sequences  # noqa: E402
+
+
+def make_listing(count, seed=0):
+    '''shots of 1000 frames, some stills and shuffled like a real listing'''
+    rng = random.Random(seed)
+    names = []
+    shot = 0
+    while len(names) < count:
+        if shot % 10 == 9:
+            names.extend('still_%06d_%d.png' % (shot, i) for i in range(100))
+        else:
+            names.extend('sh%04d/plate_v%03d.%04d.exr' % (shot, shot % 7, 1001 + frame)
+                         for frame in range(1000))
+        shot += 1
+    del names[count:]
+    rng.shuffle(names)
+    return names
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    names = make_listing(count)
+
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        sequences = list(find_image_sequences(names))
+        timings.append(time.perf_counter() - start)
+
+    print('find_image_sequences: %d files -> %d entries, best of 3: %.3f s'
+          % (count, len(sequences), min(timings)))
+
+
+if __name__ == "__main__":
+    main()
@@ -34,8 +34,13 @@ bl_info = {
 }
 
 import os
+import time
 import warnings
 import re
+import json
+import hashlib
+import subprocess
+import tempfile
 from itertools import count, repeat
 from collections import namedtuple
 from math import pi
@@ -63,6 +68,17 @@ from bpy_extras.image_utils import load_image
 # Module-level Shared State
 
 watched_objects = {}  # used to trigger compositor updates on scene updates
+pending_proxies = {}  # image name -> (source path, proxy path, factor), see request_proxy
+proxy_jobs = []  # (process, jobs file, image names) of running proxy generators
+suspended_proxies = set()  # names of images switched to full resolution for rendering
+saved_proxies = set()  # names of images showing their proxy while the .blend is written
+data_generation = 0  # counts undo, redo and file loads, they invalidate held ID references
+
+# Events a chunked import lets through, everything else could change the data it holds
+NAVIGATION_EVENTS = {
+    'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE',
+    'TRACKPADPAN', 'TRACKPADZOOM', 'MOUSEROTATE', 'NDOF_MOTION',
+}
 
 
 # -----------------------------------------------------------------------------
@@ -155,19 +171,51 @@ def find_image_sequences(files):
             yield prev_file, 1, 1
 
 
-def load_images(filenames, directory, force_reload=False, frame_start=1, find_sequences=False):
+def image_path_key(filepath, library=None):
+    return os.path.normcase(os.path.normpath(bpy.path.abspath(filepath, library=library)))
+
+
+def source_filepath(image):
+    """File path of image, the full resolution one while a proxy is shown"""
+    return image.get('iap_full_path', image.filepath)
+
+
+def index_images_by_path():
+    """Loaded images by normalized absolute file path of their source"""
+    index = {}
+    for image in bpy.data.images:
+        if image.source in {'FILE', 'SEQUENCE', 'MOVIE'} and image.filepath:
+            index.setdefault(image_path_key(source_filepath(image), image.library), image)
+    return index
+
+
+def load_images(filenames, directory, force_reload=False, frame_start=1, find_sequences=False,
+                images_by_path=None):
     """Wrapper for bpy's load_image
 
     Loads a set of images, movies, or even image sequences
     Returns a generator of ImageSpec wrapper objects later used for texture setup
+
+    images_by_path is an optional index_images_by_path() result, looked up
+    instead of letting Blender compare the path of every image each time.
+    It is built here if not given, load_image can't find images showing a
+    proxy by their source path.
     """
+    if images_by_path is None:
+        images_by_path = index_images_by_path()
     if find_sequences:  # if finding sequences, we need some pre-processing first
         file_iter = find_image_sequences(filenames)
     else:
         file_iter = zip(filenames, repeat(1), repeat(1))
 
     for filename, offset, frames in file_iter:
-        image = load_image(filename, directory, check_existing=True, force_reload=force_reload)
+        key = image_path_key(os.path.join(directory, filename))
+        image = images_by_path.get(key)
+        if image is not None and force_reload:
+            image.reload()
+        if image is None:
+            image = load_image(filename, directory, check_existing=True, force_reload=force_reload)
+            images_by_path[key] = image
 
         # Size is unavailable for sequences, so we grab it early
         size = tuple(image.size)
@@ -263,53 +311,94 @@ def center_in_camera(scene, camera, obj, axis=(1, 1)):
 # -----------------------------------------------------------------------------
 # Cycles/Eevee utils
 
-def get_input_nodes(node, links):
-    """Get nodes that are a inputs to the given node"""
-    # Get all links going to node.
-    input_links = {lnk for lnk in links if lnk.to_node == node}
-    # Sort those links, get their input nodes (and avoid doubles!).
-    sorted_nodes = []
-    done_nodes = set()
-    for socket in node.inputs:
-        done_links = set()
-        for link in input_links:
-            nd = link.from_node
-            if nd in done_nodes:
-                # Node already treated!
-                done_links.add(link)
-            elif link.to_socket == socket:
-                sorted_nodes.append(nd)
-                done_links.add(link)
-                done_nodes.add(nd)
-        input_links -= done_links
-    return sorted_nodes
-
-
-def auto_align_nodes(node_tree):
-    """Given a shader node tree, arrange nodes neatly relative to the output node."""
-    x_gap = 200
-    y_gap = 180
-    nodes = node_tree.nodes
-    links = node_tree.links
-    output_node = None
-    for node in nodes:
-        if node.type == 'OUTPUT_MATERIAL' or node.type == 'GROUP_OUTPUT':
-            output_node = node
-            break
+OUTPUT_NODE_TYPES = {'OUTPUT_MATERIAL', 'GROUP_OUTPUT', 'COMPOSITE'}
 
-    else:  # Just in case there is no output
-        return
 
-    def align(to_node):
-        from_nodes = get_input_nodes(to_node, links)
-        for i, node in enumerate(from_nodes):
-            node.location.x = min(node.location.x, to_node.location.x - x_gap)
-            node.location.y = to_node.location.y
-            node.location.y -= i * y_gap
-            node.location.y += (len(from_nodes) - 1) * y_gap / (len(from_nodes))
-            align(node)
+def index_node_links(links, nodes):
+    """Inputs and outputs of nodes from one pass over links
 
-    align(output_node)
+    Returns {node: [(input index, from node)]} and {node: [(to node, input index)]},
+    links to or from nodes outside of nodes are left out.
+    """
+    inputs = {node: [] for node in nodes}
+    outputs = {node: [] for node in nodes}
+    socket_indices = {}
+    for link in links:
+        from_node, to_node = link.from_node, link.to_node
+        if from_node not in inputs or to_node not in inputs:
+            continue
+        indices = socket_indices.get(to_node)
+        if indices is None:
+            indices = {socket.identifier: i for i, socket in enumerate(to_node.inputs)}
+            socket_indices[to_node] = indices
+        index = indices[link.to_socket.identifier]
+        inputs[to_node].append((index, from_node))
+        outputs[from_node].append((to_node, index))
+    return inputs, outputs
+
+
+def node_layers(inputs, outputs):
+    """Column of every node, its longest path to a node without outputs"""
+    layers = {}
+    pending = {node: len(to_nodes) for node, to_nodes in outputs.items()}
+    ready = [node for node, remaining in pending.items() if not remaining]
+    while ready:
+        node = ready.pop()
+        layers[node] = max((layers[to_node] + 1 for to_node, _index in outputs[node]), default=0)
+        for _index, from_node in inputs[node]:
+            pending[from_node] -= 1
+            if not pending[from_node]:
+                ready.append(from_node)
+    return layers
+
+
+def auto_align_nodes(node_tree, nodes=None, x_gap=60, y_gap=180):
+    """Arrange nodes in columns leading to the output, every location is written once.
+
+    Columns are the longest path to a node without outputs, so shared
+    inputs end up left of everything using them. Within a column nodes
+    are sorted by the mean height of the sockets they feed, which keeps
+    links from crossing. nodes defaults to all nodes except frames.
+    """
+    if nodes is None:
+        nodes = [node for node in node_tree.nodes if node.type != 'FRAME']
+    if not nodes:
+        return
+    inputs, outputs = index_node_links(node_tree.links, nodes)
+    layers = node_layers(inputs, outputs)
+
+    columns = []
+    for node, layer in layers.items():
+        while len(columns) <= layer:
+            columns.append([])
+        columns[layer].append(node)
+
+    anchor = next((node for node in columns[0] if node.type in OUTPUT_NODE_TYPES), columns[0][0])
+    x, center = anchor.location.x, anchor.location.y
+    positions = {}
+    for layer, column in enumerate(columns):
+        if layer == 0:
+            keys = {node: -i for i, node in enumerate(column)}
+        else:
+            keys = {}
+            for node in column:
+                # later sockets sit lower on the node they feed
+                heights = [positions[to_node][1] - index * y_gap / len(to_node.inputs)
+                           for to_node, index in outputs[node]]
+                keys[node] = sum(heights) / len(heights)
+            center = sum(keys.values()) / len(keys)
+        column.sort(key=lambda node: -keys[node])
+
+        # columns are right aligned, the output column starts at the anchor
+        width = max(node.width for node in column)
+        if layer:
+            x -= width + x_gap
+        top = center + (len(column) - 1) * y_gap / 2
+        for i, node in enumerate(column):
+            positions[node] = (x + width - node.width if layer else x, top - i * y_gap)
+
+    for node, location in positions.items():
+        node.location = location
 
 
 def clean_node_tree(node_tree):
@@ -403,6 +492,117 @@ def get_shadeless_node(dest_node_tree):
     return group_node
 
 
+SHADING_GROUP_VERSION = 1  # bump when get_shading_group builds a different graph
+SHADING_GROUP_INPUTS = (('NodeSocketColor', 'Color'), ('NodeSocketFloatFactor', 'Alpha'),
+                        ('NodeSocketFloat', 'Strength'))
+SHADING_GROUP_OUTPUTS = (('NodeSocketShader', 'Shader'),)
+
+
+def reconcile_group_sockets(sockets, wanted):
+    """Make the interface sockets match wanted ((socket type, name), ...)
+
+    Matching sockets are kept, so the links of group nodes using them stay.
+    """
+    names = {name for _socket_type, name in wanted}
+    for socket in list(sockets):
+        if socket.name not in names:
+            sockets.remove(socket)
+    for socket_type, name in wanted:
+        socket = sockets.get(name)
+        if socket is not None and socket.bl_socket_idname != socket_type:
+            sockets.remove(socket)
+            socket = None
+        if socket is None:
+            sockets.new(socket_type, name)
+    for index, (_socket_type, name) in enumerate(wanted):
+        current = next(i for i, socket in enumerate(sockets) if socket.name == name)
+        if current != index:
+            sockets.move(current, index)
+
+
+def build_shading_group(node_tree, shader):
+    """Fill a node group with the shading of imported planes
+
+    Inputs are the image Color and Alpha and the emission Strength. Only
+    the nodes inside are rebuilt, the interface sockets are kept.
+    """
+    node_tree.nodes.clear()
+    reconcile_group_sockets(node_tree.outputs, SHADING_GROUP_OUTPUTS)
+    reconcile_group_sockets(node_tree.inputs, SHADING_GROUP_INPUTS)
+    alpha = node_tree.inputs['Alpha']
+    alpha.default_value = 1.0
+    alpha.min_value, alpha.max_value = 0.0, 1.0
+    node_tree.inputs['Strength'].default_value = 1.0
+
+    output_node = node_tree.nodes.new('NodeGroupOutput')
+    input_node = node_tree.nodes.new('NodeGroupInput')
+
+    if shader == 'DIFFUSE':
+        core_shader = node_tree.nodes.new('ShaderNodeBsdfDiffuse')
+    elif shader == 'SHADELESS':
+        core_shader = get_shadeless_node(node_tree)
+    else:  # Emission Shading
+        core_shader = node_tree.nodes.new('ShaderNodeEmission')
+        node_tree.links.new(core_shader.inputs[1], input_node.outputs['Strength'])
+    node_tree.links.new(core_shader.inputs[0], input_node.outputs['Color'])
+
+    bsdf_transparent = node_tree.nodes.new('ShaderNodeBsdfTransparent')
+    mix_shader = node_tree.nodes.new('ShaderNodeMixShader')
+    node_tree.links.new(mix_shader.inputs[0], input_node.outputs['Alpha'])
+    node_tree.links.new(mix_shader.inputs[1], bsdf_transparent.outputs[0])
+    node_tree.links.new(mix_shader.inputs[2], core_shader.outputs[0])
+    node_tree.links.new(output_node.inputs[0], mix_shader.outputs[0])
+
+    auto_align_nodes(node_tree)
+    node_tree['iap_version'] = SHADING_GROUP_VERSION
+
+
+def get_shading_group(dest_node_tree, shader):
+    """Return a node using the shared IAP_SHADING group for shader
+
+    Groups from an older version of this add-on are rebuilt in place, so
+    every material using them follows.
+    """
+    name = 'IAP_SHADING_' + shader
+    node_tree = bpy.data.node_groups.get(name)
+    if node_tree is None:
+        node_tree = bpy.data.node_groups.new(name, 'ShaderNodeTree')
+        build_shading_group(node_tree, shader)
+    elif node_tree.get('iap_version') != SHADING_GROUP_VERSION:
+        build_shading_group(node_tree, shader)
+        relink_shading_group_users(node_tree)
+
+    group_node = dest_node_tree.nodes.new("ShaderNodeGroup")
+    group_node.node_tree = node_tree
+    return group_node
+
+
+def relink_shading_group_users(node_tree):
+    """Check that materials using node_tree still feed their image into it
+
+    Run after an upgrade, a group node that lost its Color link is linked
+    to the image node of its material again. Returns the number of links
+    restored.
+    """
+    restored = 0
+    for material in bpy.data.materials:
+        if material.node_tree is None:
+            continue
+        nodes = material.node_tree.nodes
+        image_node = nodes.get(IMAGE_NODE_NAME)
+        if image_node is None:
+            continue
+        for node in nodes:
+            if (node.bl_idname == 'ShaderNodeGroup' and node.node_tree == node_tree
+                    and not node.inputs['Color'].is_linked):
+                material.node_tree.links.new(node.inputs['Color'], image_node.outputs['Color'])
+                restored += 1
+    if restored:
+        print('Images as Planes: relinked the image of %d material(s) to %s'
+              % (restored, node_tree.name))
+    return restored
+
+
 # -----------------------------------------------------------------------------
 # Corner Pin Driver Helpers
 
@@ -546,7 +746,6 @@ def setup_compositing(context, plane, img_spec):
     image_node = node_tree.nodes.new("CompositorNodeImage")
     image_node.name = name + "_image"
     image_node.image = img_spec.image
-    image_node.location = Vector((0, 0))
     image_node.frame_start = img_spec.frame_start
     image_node.frame_offset = img_spec.frame_offset
     image_node.frame_duration = img_spec.frame_duration
@@ -554,17 +753,15 @@ def setup_compositing(context, plane, img_spec):
     scale_node = node_tree.nodes.new("CompositorNodeScale")
     scale_node.name = name + "_scale"
     scale_node.space = 'RENDER_SIZE'
-    scale_node.location = image_node.location + \
-        Vector((image_node.width + 20, 0))
     scale_node.show_options = False
 
     cornerpin_node = node_tree.nodes.new("CompositorNodeCornerPin")
     cornerpin_node.name = name + "_cornerpin"
-    cornerpin_node.location = scale_node.location + \
-        Vector((0, -scale_node.height))
 
     node_tree.links.new(scale_node.inputs[0], image_node.outputs[0])
     node_tree.links.new(cornerpin_node.inputs[0], scale_node.outputs[0])
+    # Only this plane's nodes, the rest of the compositor stays where it is
+    auto_align_nodes(node_tree, (image_node, scale_node, cornerpin_node), x_gap=20)
 
     # Put all the nodes in a frame for organization
     frame_node = group_in_frame(
@@ -601,6 +798,315 @@ def setup_compositing(context, plane, img_spec):
     scene.update()
 
 
+# -----------------------------------------------------------------------------
+# Material Templates
+
+TEMPLATE_PREFIX = ".IAP_template_v"
+TEMPLATE_VERSION = 1  # bump when build_cycles_nodes changes
+IMAGE_NODE_NAME = "IAP_IMAGE"
+
+# Reused materials are patched towards the template instead of rebuilt,
+# every written value makes Eevee compile the shader again.
+# Kept in line with util_node_patch.py of the rewrite, this file stays standalone.
+PATCHED_MATERIAL_SETTINGS = ('blend_method', 'shadow_method', 'use_backface_culling',
+                             'show_transparent_back')
+NODE_VALUE_TYPES = {'BOOLEAN', 'INT', 'FLOAT', 'STRING', 'ENUM', 'POINTER'}
+
+
+def set_changed(owner, attribute, value):
+    """Set owner.attribute unless it already is value"""
+    if getattr(owner, attribute) != value:
+        setattr(owner, attribute, value)
+        return True
+    return False
+
+
+def comparable_value(value):
+    if hasattr(value, '__len__') and not isinstance(value, (str, set, bpy.types.ID)):
+        return tuple(value)
+    return value
+
+
+def node_values(node):
+    """Settings of the node type and input values, the image is assigned separately"""
+    base = {prop.identifier for prop in bpy.types.Node.bl_rna.properties} - {'mute'}
+    settings = {prop.identifier: comparable_value(getattr(node, prop.identifier))
+                for prop in node.bl_rna.properties
+                if prop.type in NODE_VALUE_TYPES and not prop.is_readonly
+                and prop.identifier not in base and prop.identifier != 'image'}
+    inputs = {socket.identifier: comparable_value(socket.default_value)
+              for socket in node.inputs if hasattr(socket, 'default_value')}
+    return settings, inputs
+
+
+def find_socket(sockets, identifier):
+    return next(socket for socket in sockets if socket.identifier == identifier)
+
+
+def patch_node_tree(node_tree, template_tree):
+    """Change node_tree into a copy of template_tree, only writing the differences
+
+    Nodes are matched by name. Returns the number of changes.
+    """
+    nodes = node_tree.nodes
+    template_nodes = {node.name: node for node in template_tree.nodes}
+    changes = 0
+    for node in list(nodes):
+        source = template_nodes.get(node.name)
+        if source is None or source.bl_idname != node.bl_idname:
+            nodes.remove(node)
+            changes += 1
+
+    for name, source in template_nodes.items():
+        node = nodes.get(name)
+        if node is None:
+            node = nodes.new(source.bl_idname)
+            node.name = name
+            node.location = source.location
+            node.width = source.width
+            node.label = source.label
+            changes += 1
+        settings, inputs = node_values(source)
+        current_settings, _current_inputs = node_values(node)
+        for identifier, value in settings.items():
+            if current_settings.get(identifier) != value:
+                setattr(node, identifier, value)
+                changes += 1
+        # after the settings, a group's node tree decides its inputs
+        _current_settings, current_inputs = node_values(node)
+        for identifier, value in inputs.items():
+            if current_inputs.get(identifier) != value:
+                find_socket(node.inputs, identifier).default_value = value
+                changes += 1
+
+    def link_keys(tree):
+        return {(link.from_node.name, link.from_socket.identifier,
+                 link.to_node.name, link.to_socket.identifier): link for link in tree.links}
+
+    current = link_keys(node_tree)
+    target = link_keys(template_tree)
+    for key, link in current.items():
+        if key not in target:
+            node_tree.links.remove(link)
+            changes += 1
+    for from_name, from_socket, to_name, to_socket in target.keys() - current.keys():
+        node_tree.links.new(find_socket(nodes[to_name].inputs, to_socket),
+                            find_socket(nodes[from_name].outputs, from_socket))
+        changes += 1
+    return changes
+
+
+def patch_material(material, template):
+    """patch_node_tree with the material settings, 0 if nothing was written"""
+    changes = set_changed(material, 'use_nodes', True)
+    for setting in PATCHED_MATERIAL_SETTINGS:
+        if hasattr(template, setting):
+            changes += set_changed(material, setting, getattr(template, setting))
+    return changes + patch_node_tree(material.node_tree, template.node_tree)
+
+
+# -----------------------------------------------------------------------------
+# Proxy Helpers
+
+PROXY_FACTORS = {'HALF': 2, 'QUARTER': 4, 'EIGHTH': 8}
+PROXY_CACHE_LIMIT = 4 << 30  # bytes of proxies kept, the least recently used go first
+PROXY_MAX_AGE = 60 * 24 * 3600  # seconds an unused proxy is kept
+
+# Runs in a background Blender, so the UI never waits for the downscaling
+PROXY_SCRIPT = """
+import json, os, sys
+import bpy
+with open(sys.argv[sys.argv.index('--') + 1]) as f:
+    jobs = json.load(f)
+for source, target, factor in jobs:
+    try:
+        image = bpy.data.images.load(source)
+        width, height = image.size
+        image.scale(max(1, width // factor), max(1, height // factor))
+        image.file_format = 'OPEN_EXR' if target.endswith('.exr') else 'PNG'
+        image.filepath_raw = target + '.part'
+        image.save()
+        bpy.data.images.remove(image)
+        os.replace(target + '.part', target)
+    except Exception as err:
+        print('Images as Planes: no proxy for', source, err)
+"""
+
+
+def proxy_path(source, factor):
+    """Cache path of the proxy for source, a new one whenever source changes"""
+    stat = os.stat(source)
+    key = "%s|%d|%d" % (source, stat.st_mtime_ns, stat.st_size)
+    digest = hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+    name, ext = os.path.splitext(os.path.basename(source))
+    ext = '.exr' if ext.lower() in {'.exr', '.hdr'} else '.png'  # keep float data float
+    return os.path.join(proxy_directory(), "%s_%s_%d%s" % (name, digest, factor, ext))
+
+
+def proxy_directory():
+    return bpy.utils.user_resource(
+        'DATAFILES', path=os.path.join('io_import_images_as_planes', 'proxies'), create=True)
+
+
+def trim_proxy_cache(limit=PROXY_CACHE_LIMIT, max_age=PROXY_MAX_AGE):
+    """Remove old proxies and the least recently used ones above limit bytes
+
+    Proxies of images in the open file are kept. A file that used a
+    removed proxy shows full resolution until it is requested again.
+    """
+    directory = proxy_directory()
+    in_use = {os.path.normcase(image['iap_proxy_path'])
+              for image in bpy.data.images if 'iap_proxy_path' in image}
+    entries = []
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and os.path.normcase(entry.path) not in in_use:
+                stat = entry.stat()
+                entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)  # most recently used first
+
+    now = time.time()
+    total = 0
+    for used, size, path in entries:
+        total += size
+        if total > limit or now - used > max_age:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def request_proxy(image, factor):
+    """Queue a proxy for image, start_proxy_jobs generates all queued ones"""
+    if image.source != 'FILE' or image.packed_file:
+        return
+    full_path = source_filepath(image)  # re-imports may already show the proxy
+    source = bpy.path.abspath(full_path)
+    try:
+        target = proxy_path(source, factor)
+    except OSError:
+        return
+    image['iap_full_path'] = full_path
+    image['iap_proxy_path'] = target
+    if os.path.exists(target):
+        use_proxy(image, True)
+    else:
+        pending_proxies[image.name] = (source, target, factor)
+
+
+def start_proxy_jobs():
+    """Generate all queued proxies in one background Blender process"""
+    if not pending_proxies:
+        return
+    jobs = list(pending_proxies.values())
+    names = list(pending_proxies)
+    pending_proxies.clear()
+    trim_proxy_cache()
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(jobs, f)
+    process = subprocess.Popen(
+        [bpy.app.binary_path, '--background', '--factory-startup',
+         '--python-expr', PROXY_SCRIPT, '--', f.name],
+        stdout=subprocess.DEVNULL)
+    proxy_jobs.append((process, f.name, names))
+    if not bpy.app.timers.is_registered(check_proxy_jobs):
+        bpy.app.timers.register(check_proxy_jobs, first_interval=1.0)
+
+
+def check_proxy_jobs():
+    """Timer: switch images to their proxies once the generator is done"""
+    for job in list(proxy_jobs):
+        process, jobs_file, names = job
+        if process.poll() is None:
+            continue
+        proxy_jobs.remove(job)
+        os.remove(jobs_file)
+        for name in names:
+            image = bpy.data.images.get(name)
+            if image and os.path.exists(image.get('iap_proxy_path', '')):
+                use_proxy(image, True)
+    return 1.0 if proxy_jobs else None
+
+
+def use_proxy(image, proxy):
+    """Point image at its proxy or at the full resolution file"""
+    path = image['iap_proxy_path'] if proxy else image['iap_full_path']
+    if image.filepath != path:
+        image.filepath = path  # reloads, freeing the other resolution
+
+
+def proxy_images():
+    """Images with a generated proxy"""
+    return [image for image in bpy.data.images
+            if 'iap_proxy_path' in image and os.path.exists(image['iap_proxy_path'])]
+
+
+def is_proxy_active(image):
+    return image.filepath == image['iap_proxy_path']
+
+
+@bpy.app.handlers.persistent
+def proxies_save_pre(*args):
+    """Save the full resolution paths, other machines don't have the proxies"""
+    for image in proxy_images():
+        if is_proxy_active(image):
+            saved_proxies.add(image.name)
+            image.filepath_raw = image['iap_full_path']  # no reload, the proxy stays loaded
+
+
+@bpy.app.handlers.persistent
+def proxies_save_post(*args):
+    for name in saved_proxies:
+        image = bpy.data.images.get(name)
+        if image and 'iap_proxy_path' in image:
+            image.filepath_raw = image['iap_proxy_path']
+    saved_proxies.clear()
+
+
+@bpy.app.handlers.persistent
+def proxies_load_post(*args):
+    """Repair files saved while a proxy was active by older versions"""
+    for image in bpy.data.images:
+        if ('iap_proxy_path' in image and is_proxy_active(image)
+                and not os.path.exists(image['iap_proxy_path'])):
+            use_proxy(image, False)
+
+
+@bpy.app.handlers.persistent
+def proxies_render_init(*args):
+    """Render at full resolution, once per job so animations don't reload per frame"""
+    for image in proxy_images():
+        if is_proxy_active(image):
+            suspended_proxies.add(image.name)
+            use_proxy(image, False)
+
+
+@bpy.app.handlers.persistent
+def proxies_render_pre(*args):
+    '''guard for proxies switched on during the render, no-op otherwise'''
+    if any(is_proxy_active(image) for image in proxy_images()):
+        proxies_render_init()
+
+
+@bpy.app.handlers.persistent
+def proxies_render_complete(*args):
+    for name in suspended_proxies:
+        image = bpy.data.images.get(name)
+        if image and 'iap_proxy_path' in image:
+            use_proxy(image, True)
+    suspended_proxies.clear()
+
+
+@bpy.app.handlers.persistent
+def invalidate_data(*args):
+    '''undo/redo/load_pre handler: running chunked imports stop at their next step'''
+    global data_generation
+    data_generation += 1
+
+
 # -----------------------------------------------------------------------------
 # Operator
 
@@ -634,6 +1140,24 @@ class IMPORT_IMAGE_OT_to_plane(Operator, AddObjectHelper):
                     "image sequence instead of separate planes"
     )
 
+    use_modal: BoolProperty(
+        name="Import in Chunks", default=False,
+        description="Keep Blender responsive and show progress while importing. "
+                    "Press Esc to stop, planes imported so far are kept"
+    )
+
+    PROXY_SIZES = (
+        ('NONE', "Full", "Always use the full resolution image"),
+        ('HALF', "1/2", "Half resolution in the viewport"),
+        ('QUARTER', "1/4", "Quarter resolution in the viewport"),
+        ('EIGHTH', "1/8", "Eighth resolution in the viewport"),
+    )
+    proxy_size: EnumProperty(
+        name="Viewport Proxy", default='NONE', items=PROXY_SIZES,
+        description="Generate downscaled copies in the background for the viewport, "
+                    "renders always use the full resolution image"
+    )
+
     # -------------------------------------
     # Properties - Position and Orientation
     axis_id_to_vector = {
@@ -737,6 +1261,11 @@ class IMPORT_IMAGE_OT_to_plane(Operator, AddObjectHelper):
         name="Strength", min=0.0, default=1.0, soft_max=10.0,
         step=100, description="Brightness of Emission Texture")
 
+    shared_shading: BoolProperty(
+        name="Shared Shading Group", default=False,
+        description="Keep the shading in one node group per shader that all "
+                    "imported materials use, so it can be changed in one place")
+
     overwrite_material: BoolProperty(
         name="Overwrite Material", default=True,
         description="Overwrite existing Material (based on material name)")
@@ -777,6 +1306,8 @@ class IMPORT_IMAGE_OT_to_plane(Operator, AddObjectHelper):
 
         box.prop(self, "force_reload")
         box.prop(self, "image_sequence")
+        box.prop(self, "use_modal")
+        box.prop(self, "proxy_size")
 
     def draw_material_config(self, context):
         # --- Material / Rendering Properties --- #
@@ -797,6 +1328,7 @@ class IMPORT_IMAGE_OT_to_plane(Operator, AddObjectHelper):
         if engine not in ('CYCLES', 'BLENDER_EEVEE', 'BLENDER_OPENGL'):
             box.label(text="%s is not supported" % engine, icon='ERROR')
 
+        box.prop(self, "shared_shading")
         box.prop(self, "overwrite_material")
 
         box.label(text="Texture Settings:", icon='TEXTURE')
@@ -874,29 +1406,116 @@ class IMPORT_IMAGE_OT_to_plane(Operator, AddObjectHelper):
         if context.active_object and context.active_object.mode == 'EDIT':
             bpy.ops.object.mode_set(mode='OBJECT')
 
+        # Lookups by name or path, kept up to date while importing.
+        # Rebuilt every run, a redo has undone the datablocks of the last one.
+        self._materials_by_name = {mat.name: mat for mat in bpy.data.materials}
+        self._images_by_path = index_images_by_path()
+
+        # A redo has to finish synchronously
+        if self.use_modal and context.window and not self.is_repeat():
+            self._editmode = editmode
+            return self.start_modal_import(context)
+
         self.import_images(context)
 
         context.user_preferences.edit.use_enter_edit_mode = editmode
 
         return {'FINISHED'}
 
-    def import_images(self, context):
-
+    def load_image_specs(self):
         # load images / sequences
-        images = tuple(load_images(
-            (fn.name for fn in self.files),
+        return load_images(
+            [fn.name for fn in self.files],
             self.directory,
             force_reload=self.force_reload,
-            find_sequences=self.image_sequence
-        ))
+            find_sequences=self.image_sequence,
+            images_by_path=self._images_by_path
+        )
+
+    def import_images(self, context):
 
         # Create individual planes
-        planes = [self.single_image_spec_to_plane(context, img_spec) for img_spec in images]
+        planes = [self.single_image_spec_to_plane(context, img_spec)
+                  for img_spec in self.load_image_specs()]
+
+        self.finish_import(context, planes)
 
+    # -------------------------------------------------------------------------
+    # Chunked import
+    MODAL_CHUNK_TIME = 0.1  # seconds of work between UI updates
+
+    def start_modal_import(self, context):
+        # The generator is consumed a chunk at a time by modal()
+        self._image_specs = self.load_image_specs()
+        self._planes = []
+        self._files_done = 0  # a sequence plane uses up one file per frame
+        self._data_generation = data_generation
+
+        wm = context.window_manager
+        wm.progress_begin(0, len(self.files))
+        self._timer = wm.event_timer_add(0.001, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if self._data_generation != data_generation:
+            # Undo or a file load freed the images, materials and planes held here
+            self.report({'WARNING'}, "Import cancelled, the data changed")
+            return self.cancel_modal_import(context)
+
+        if event.type == 'ESC':
+            self.report({'WARNING'}, "Import stopped")
+            return self.finish_modal_import(context)
+
+        if event.type in NAVIGATION_EVENTS:
+            return {'PASS_THROUGH'}
+        if event.type != 'TIMER':
+            return {'RUNNING_MODAL'}
+
+        # Each plane is created completely before checking the time, so the
+        # scene is consistent whenever control goes back to the UI
+        deadline = time.perf_counter() + self.MODAL_CHUNK_TIME
+        for img_spec in self._image_specs:
+            self._planes.append(self.single_image_spec_to_plane(context, img_spec))
+            self._files_done += img_spec.frame_duration if img_spec.image.source == 'SEQUENCE' else 1
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            return self.finish_modal_import(context)
+
+        context.window_manager.progress_update(min(self._files_done, len(self.files)))
+        return {'RUNNING_MODAL'}
+
+    def finish_modal_import(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        self._image_specs.close()
+
+        self.finish_import(context, self._planes)
+
+        context.user_preferences.edit.use_enter_edit_mode = self._editmode
+        return {'FINISHED'}
+
+    def cancel_modal_import(self, context):
+        '''stop without touching any of the held datablocks'''
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        self._image_specs.close()
+        self._planes = []
+        self._materials_by_name = {}
+        self._images_by_path = {}
+
+        context.user_preferences.edit.use_enter_edit_mode = self._editmode
+        return {'CANCELLED'}
+
+    def finish_import(self, context, planes):
         context.scene.update()
+        start_proxy_jobs()
 
         # Align planes relative to each other
-        if self.offset:
+        if self.offset and planes:
             offset_axis = self.axis_id_to_vector[self.offset_axis]
             offset_planes(planes, self.offset_amount, offset_axis)
 
@@ -938,28 +1557,28 @@ class IMPORT_IMAGE_OT_to_plane(Operator, AddObjectHelper):
         return plane
 
     def apply_image_options(self, image):
-        image.use_alpha = self.use_transparency
-        image.alpha_mode = self.alpha_mode
+        # unchanged values are not written again, that would reload the image
+        set_changed(image, 'use_alpha', self.use_transparency)
+        set_changed(image, 'alpha_mode', self.alpha_mode)
 
         if self.relative:
             try:  # can't always find the relative path (between drive letters on windows)
-                image.filepath = bpy.path.relpath(image.filepath)
+                set_changed(image, 'filepath', bpy.path.relpath(image.filepath))
             except ValueError:
                 pass
 
     def apply_texture_options(self, texture, img_spec):
         # Shared by both Cycles and Blender Internal
+        # Unchanged values aren't written, reused materials stay compiled
         image_user = texture.image_user
-        image_user.use_auto_refresh = self.use_auto_refresh
-        image_user.frame_start = img_spec.frame_start
-        image_user.frame_offset = img_spec.frame_offset
-        image_user.frame_duration = img_spec.frame_duration
-
         # Image sequences need auto refresh to display reliably
-        if img_spec.image.source == 'SEQUENCE':
-            image_user.use_auto_refresh = True
+        set_changed(image_user, 'use_auto_refresh',
+                    self.use_auto_refresh or img_spec.image.source == 'SEQUENCE')
+        set_changed(image_user, 'frame_start', img_spec.frame_start)
+        set_changed(image_user, 'frame_offset', img_spec.frame_offset)
+        set_changed(image_user, 'frame_duration', img_spec.frame_duration)
 
-        texture.extension = 'CLIP'  # Default of "Repeat" can cause artifacts
+        set_changed(texture, 'extension', 'CLIP')  # Default of "Repeat" can cause artifacts
 
     def apply_material_options(self, material, slot):
         shader = self.shader
@@ -985,28 +1604,67 @@ class IMPORT_IMAGE_OT_to_plane(Operator, AddObjectHelper):
     # Cycles/Eevee
     def create_cycles_texnode(self, context, node_tree, img_spec):
         tex_image = node_tree.nodes.new('ShaderNodeTexImage')
-        tex_image.image = img_spec.image
+        tex_image.name = IMAGE_NODE_NAME
         tex_image.show_texture = True
-        self.apply_texture_options(tex_image, img_spec)
+        if img_spec is not None:
+            self.assign_cycles_image(tex_image, img_spec)
         return tex_image
 
+    def assign_cycles_image(self, tex_image, img_spec):
+        set_changed(tex_image, 'image', img_spec.image)
+        self.apply_texture_options(tex_image, img_spec)
+        if self.proxy_size != 'NONE':
+            request_proxy(img_spec.image, PROXY_FACTORS[self.proxy_size])
+
+    def cycles_material_template(self, context):
+        """Hidden material with the nodes for the current options, built once"""
+        name = "%s%d_%s_%d_%g_%d" % (TEMPLATE_PREFIX, TEMPLATE_VERSION, self.shader,
+                                     self.use_transparency, self.emit_strength,
+                                     self.shared_shading)
+        template = self._materials_by_name.get(name)
+        if template is None:
+            template = bpy.data.materials.new(name=name)
+            template.use_nodes = True
+            self.build_cycles_nodes(context, template.node_tree, None)
+            self._materials_by_name[template.name] = template
+        return template
+
     def create_cycles_material(self, context, img_spec):
         image = img_spec.image
         name_compat = bpy.path.display_name_from_filepath(image.filepath)
         material = None
         if self.overwrite_material:
-            for mat in bpy.data.materials:
-                if mat.name == name_compat:
-                    material = mat
-        if not material:
-            material = bpy.data.materials.new(name=name_compat)
-
-        material.use_nodes = True
-        node_tree = material.node_tree
+            material = self._materials_by_name.get(name_compat)
+
+        if material:
+            # Patched, not rebuilt: an unchanged material keeps its compiled shader
+            patch_material(material, self.cycles_material_template(context))
+            self.assign_cycles_image(material.node_tree.nodes[IMAGE_NODE_NAME], img_spec)
+        else:
+            # Copying is one call, building costs dozens of node and link calls
+            material = self.cycles_material_template(context).copy()
+            material.name = name_compat
+            self._materials_by_name[material.name] = material
+            self.assign_cycles_image(material.node_tree.nodes[IMAGE_NODE_NAME], img_spec)
+        return material
+
+    def build_cycles_nodes(self, context, node_tree, img_spec):
+        """Build the material nodes, img_spec is None for templates"""
         out_node = clean_node_tree(node_tree)
 
         tex_image = self.create_cycles_texnode(context, node_tree, img_spec)
 
+        if self.shared_shading:
+            shading = get_shading_group(node_tree, self.shader)
+            shading.name = "IAP_SHADING"
+            shading.inputs['Strength'].default_value = self.emit_strength
+            node_tree.links.new(shading.inputs['Color'], tex_image.outputs[0])
+            if self.use_transparency:
+                node_tree.links.new(shading.inputs['Alpha'], tex_image.outputs[1])
+            node_tree.links.new(out_node.inputs[0], shading.outputs[0])
+            auto_align_nodes(node_tree)
+            return
+
         if self.shader == 'DIFFUSE':
             core_shader = node_tree.nodes.new('ShaderNodeBsdfDiffuse')
         elif self.shader == 'SHADELESS':
@@ -1030,7 +1688,6 @@ class IMPORT_IMAGE_OT_to_plane(Operator, AddObjectHelper):
         node_tree.links.new(out_node.inputs[0], core_shader.outputs[0])
 
         auto_align_nodes(node_tree)
-        return material
 
     # -------------------------------------------------------------------------
     # Geometry Creation
@@ -1144,6 +1801,27 @@ class IMPORT_IMAGE_OT_to_plane(Operator, AddObjectHelper):
             constraint.lock_axis = 'LOCK_Y'
 
 
+class IMPORT_IMAGE_OT_toggle_proxies(Operator):
+    """Switch images between their viewport proxies and full resolution"""
+
+    bl_idname = "import_image.toggle_proxies"
+    bl_label = "Toggle Image Proxies"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return any('iap_proxy_path' in image for image in bpy.data.images)
+
+    def execute(self, context):
+        images = proxy_images()
+        proxy = not any(map(is_proxy_active, images))
+        for image in images:
+            use_proxy(image, proxy)
+        self.report({'INFO'}, "{} image(s) at {} resolution".format(
+            len(images), "proxy" if proxy else "full"))
+        return {'FINISHED'}
+
+
 # -----------------------------------------------------------------------------
 # Register
 
@@ -1153,6 +1831,7 @@ def import_images_button(self, context):
 
 classes = (
     IMPORT_IMAGE_OT_to_plane,
+    IMPORT_IMAGE_OT_toggle_proxies,
 )
 
 
@@ -1166,6 +1845,19 @@ def register():
     bpy.app.handlers.load_post.append(register_driver)
     register_driver()
 
+    bpy.app.handlers.save_pre.append(proxies_save_pre)
+    bpy.app.handlers.save_post.append(proxies_save_post)
+    bpy.app.handlers.load_post.append(proxies_load_post)
+
+    for handlers in (bpy.app.handlers.undo_pre, bpy.app.handlers.redo_pre,
+                     bpy.app.handlers.load_pre):
+        handlers.append(invalidate_data)
+
+    bpy.app.handlers.render_init.append(proxies_render_init)
+    bpy.app.handlers.render_pre.append(proxies_render_pre)
+    bpy.app.handlers.render_complete.append(proxies_render_complete)
+    bpy.app.handlers.render_cancel.append(proxies_render_complete)
+
 
 def unregister():
     bpy.types.TOPBAR_MT_file_import.remove(import_images_button)
@@ -1178,6 +1870,21 @@ def unregister():
     bpy.app.handlers.load_post.remove(register_driver)
     del bpy.app.driver_namespace['import_image__find_plane_corner']
 
+    bpy.app.handlers.save_pre.remove(proxies_save_pre)
+    bpy.app.handlers.save_post.remove(proxies_save_post)
+    bpy.app.handlers.load_post.remove(proxies_load_post)
+
+    for handlers in (bpy.app.handlers.undo_pre, bpy.app.handlers.redo_pre,
+                     bpy.app.handlers.load_pre):
+        handlers.remove(invalidate_data)
+
+    bpy.app.handlers.render_init.remove(proxies_render_init)
+    bpy.app.handlers.render_pre.remove(proxies_render_pre)
+    bpy.app.handlers.render_complete.remove(proxies_render_complete)
+    bpy.app.handlers.render_cancel.remove(proxies_render_complete)
+    if bpy.app.timers.is_registered(check_proxy_jobs):
+        bpy.app.timers.unregister(check_proxy_jobs)
+
     for cls in classes:
         bpy.utils.unregister_class(cls)
 
@@ -17,25 +17,23 @@ from mathutils import (
 )
 
 
-def calc_row_count(self, obs):
-    if self.row_count == 1:
-        return len(obs)
-    return ceil(len(obs) / self.row_count)
+DEFAULT_OFFSET = 2.0
 
 
-def grid_arange(self, context, obs):
-    obs_per_row = calc_row_count(self, obs)
+def grid_positions(count, row_count=1, offset_x=DEFAULT_OFFSET, offset_y=DEFAULT_OFFSET):
+    """(x, y) of count grid cells in the order grid_arange fills them
+
+    >>> grid_positions(3, row_count=2)
+    [(0.0, -0.0), (2.0, -0.0), (0.0, -2.0)]
+    """
+    per_row = count if row_count == 1 else ceil(count / row_count)
+    return [((i % per_row) * offset_x, (i // per_row) * offset_y * -1) for i in range(count)]
 
-    current_row = 0
-    current_col = 0
-    for i, ob in enumerate(obs):
-        ob.location = Vector((current_col * self.offset_x,
-                              current_row * self.offset_y * -1,
-                              0)) + context.scene.cursor_location
-        current_col += 1
-        if current_col == obs_per_row:
-            current_col = 0
-            current_row += 1
+
+def grid_arange(self, context, obs):
+    positions = grid_positions(len(obs), self.row_count, self.offset_x, self.offset_y)
+    for ob, (x, y) in zip(obs, positions):
+        ob.location = Vector((x, y, 0)) + context.scene.cursor_location
 
 
 class OBJECT_OT_grid_arange(Operator):
@@ -53,11 +51,11 @@ class OBJECT_OT_grid_arange(Operator):
     )
     offset_x: FloatProperty(
         name='Offset X',
-        default=2
+        default=DEFAULT_OFFSET
     )
     offset_y: FloatProperty(
         name='Offset Y',
-        default=2
+        default=DEFAULT_OFFSET
     )
 
     @classmethod
@@ -0,0 +1,35 @@
+from bpy.types import Operator
+
+from .util_probe_cache import (
+    close_cache,
+    get_cache,
+)
+
+
+class IIAP_OT_clear_probe_cache(Operator):
+    """Clear the image metadata cache"""
+    bl_idname = 'image.clear_probe_cache'
+    bl_label = 'Clear image metadata cache'
+    bl_description = 'Forget cached image sizes and sequences of previous imports'
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        cache = get_cache()
+        if cache is None:
+            self.report({'WARNING'}, 'Image metadata cache is not available')
+            return {'CANCELLED'}
+        cache.clear()
+        self.report({'INFO'}, 'Cleared image metadata cache')
+        return {'FINISHED'}
+
+def register():
+    from bpy.utils import register_class
+    register_class(IIAP_OT_clear_probe_cache)
+
+def unregister():
+    from bpy.utils import unregister_class
+    unregister_class(IIAP_OT_clear_probe_cache)
+    close_cache()
+
+if __name__ == "__main__":
+    register()
@@ -1,12 +1,15 @@
 '''import images operators'''
 
 import os
+from collections import namedtuple
+
 import bpy
 
 from bpy.props import (
     BoolProperty,
     CollectionProperty,
     EnumProperty,
+    IntProperty,
     StringProperty,
 )
 from bpy.types import (
@@ -14,27 +17,108 @@ from bpy.types import (
     OperatorFileListElement,
 )
 from bpy_extras.io_utils import ImportHelper
+from mathutils import Vector
 from bpy_extras.object_utils import (
     AddObjectHelper,
     object_data_add,
 )
+from .util_deferred import (
+    defer_mesh_aspect,
+    register_deferred,
+    unregister_deferred,
+)
+from .util_atlas import (
+    atlas_uv_rect,
+    pack_atlases,
+)
+from .util_udim import (
+    UDIM_MIN_VERSION,
+    pack_udims,
+    tile_folder,
+    udim_uv_rect,
+)
+from .util_datablocks import DatablockIndex
 from .util_load_images import (
     load_images,
     ImageSpec
 )
+from .util_sequences import (
+    MAX_GAP,
+    find_image_sequences,
+)
+from .util_probe_images import (
+    find_duplicates,
+    probe_files,
+)
+from .util_probe_cache import (
+    get_cache,
+)
+from .util_scan import (
+    scan_directory,
+    split_patterns,
+)
 from .util_materials import (
     create_material_for_img_spec,
+    create_materials_for_img_specs,
+)
+from .util_alpha import (
+    read_alpha,
+)
+from .util_contour import (
+    alpha_contour,
 )
 from .util_mesh import (
+    create_contour_mesh,
+    create_merged_mesh,
     create_mesh,
-    set_mesh_verticies
+    create_shared_mesh,
+    link_plane_material,
+    shared_mesh_key,
+    shared_mesh_name,
+    set_mesh_verticies,
+    set_plane_uvs,
 )
+from .op_arange_objects import grid_positions
+
+# uv_rect is the (u0, v0, u1, v1) part of the material's image, None for all of it
+PlaneSpec = namedtuple('PlaneSpec', ['img_spec', 'material', 'uv_rect'])
+MAX_MERGED_MATERIALS = 32767  # material indices are shorts
 
 
 def set_select(context, obs):
     for ob in obs:
         ob.select_set(True)
 
+
+def with_duplicates(image_specs, directory, duplicates, imported_specs):
+    """Repeat the spec of a file for each of its duplicates.
+
+    duplicates maps the duplicate file paths of directory to the path of
+    the identical file, which is in directory or one imported before.
+    imported_specs collects the specs by file path across directories.
+    """
+    copies = {}
+    for original in duplicates.values():
+        copies[original] = copies.get(original, 0) + 1
+    for img_spec in image_specs:
+        filepath = os.path.join(directory, img_spec.frame_range.filename)
+        imported_specs[filepath] = img_spec
+        yield img_spec
+        for _ in range(copies.pop(filepath, 0)):
+            yield img_spec
+    # identical files of directories imported before
+    for filepath, count in copies.items():
+        if filepath in imported_specs:
+            yield from [imported_specs[filepath]] * count
+
+
+def format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            break
+        size /= 1024
+    return '{:.1f} {}'.format(size, unit) if unit != 'B' else '{} B'.format(size)
+
 class IIAP_BASE_class:
     """Base Class. Holds all the options."""
     materialtype: EnumProperty(
@@ -54,6 +138,47 @@ class IIAP_BASE_class:
         ],
         description='Alpha blend mode for the image'
     )
+    alpha_analysis: EnumProperty(
+        name='Alpha Analysis',
+        items=[
+            ('NONE', 'None', 'Treat every alpha channel as soft transparency'),
+            ('SAMPLED', 'Sampled', 'Check a sample of the pixels, all pixels are still loaded'),
+            ('FULL', 'Full', 'Check every pixel'),
+        ],
+        default='NONE',
+        description='Load the pixels of images with alpha to use opaque or clipped materials '
+                    'where they suffice'
+    )
+    graded_blend: EnumProperty(
+        name='Soft Alpha',
+        items=[
+            ('BLEND', 'Alpha Blend', 'Sorted blending, smooth but slow with many planes'),
+            ('HASHED', 'Alpha Hashed', 'Noisy dithering without sorting'),
+        ],
+        description='Blend mode for images with partially transparent pixels'
+    )
+    mesh_mode: EnumProperty(
+        name='Mesh',
+        items=[
+            ('QUAD', 'Quad', 'A rectangle covering the whole image'),
+            ('CONTOUR', 'Cut Out', 'Follow the outline of the alpha channel, '
+                                   'transparent areas cost no fill rate'),
+        ],
+        description='Shape of the planes'
+    )
+    contour_vertices: IntProperty(
+        name='Outline Vertices',
+        default=64,
+        min=8,
+        max=4096,
+        description='Most vertices used for the outlines of a cut out plane'
+    )
+    share_meshes: BoolProperty(
+        name='Share Plane Meshes',
+        default=False,
+        description='Planes with the same aspect ratio use one mesh, materials are linked '
+                    'to the objects. Not used for packing, cut out planes or deferred sizes'
+    )
     origin: EnumProperty(
         name='Origin Location',
         items=[
@@ -85,35 +210,116 @@ class IIAP_BASE_class:
         default=True,
         description='Automatically detect animated sequences in selected images'
     )
+    sequence_gap: IntProperty(
+        name='Max Frame Gap',
+        default=MAX_GAP,
+        min=1,
+        soft_max=100,
+        description='Largest jump between frame numbers inside a sequence, '
+                    'files further apart are separate images'
+    )
+    dedupe: BoolProperty(
+        name='Merge Identical Files',
+        default=False,
+        description='Files with identical contents share one image and material'
+    )
+    use_cache: BoolProperty(
+        name='Use Metadata Cache',
+        default=True,
+        description='Remember image sizes and sequences between imports of unchanged files'
+    )
 
-    def create_mesh_object_for_img_spec(self, context, img_spec):
-        # check if mesh with image name allready exists
-        NAME = img_spec.image.name
-        if not self.reuse_existing:
-            mesh = create_mesh(NAME)
-        elif not NAME in bpy.data.meshes.keys():
-            mesh = create_mesh(NAME)
-        else:
-            mesh = bpy.data.meshes[NAME]
-
-        set_mesh_verticies(mesh, img_spec.size, self.origin)
+    def create_contour_mesh_for_img_spec(self, img_spec):
+        '''mesh following the alpha outline or None to use a quad'''
+        if (not img_spec.use_alpha
+                or img_spec.size is None
+                or getattr(self, 'defer_pixels', False)  # pixels must not be read
+                or img_spec.frame_duration != 1
+                or img_spec.image.source in {'SEQUENCE', 'MOVIE'}):
+            return None
+        alpha = read_alpha(img_spec.image)
+        loops = alpha_contour(alpha, self.contour_vertices) if alpha is not None else None
+        if loops is None:
+            return None
+        mesh = create_contour_mesh(img_spec.image.name, loops, img_spec.size, self.origin)
+        self.datablocks.add(mesh)
+        return mesh
+
+    def can_share_mesh(self, img_spec):
+        '''quads whose size is known, instanced planes always share'''
+        return ((self.share_meshes or getattr(self, 'object_mode', 'OBJECTS') == 'INSTANCED')
+                and self.mesh_mode == 'QUAD'
+                and img_spec.size is not None)
+
+    def shared_mesh_for_img_spec(self, img_spec):
+        '''the mesh for all planes of this aspect ratio and origin'''
+        key = shared_mesh_key(img_spec.size, self.origin)
+        mesh = self.datablocks.get('meshes', shared_mesh_name(key))
+        if mesh is None:
+            mesh = create_shared_mesh(key)
+            self.datablocks.add(mesh)
+        return mesh
+
+    def create_mesh_object_for_img_spec(self, context, img_spec, uv_rect=None):
+        '''plane object for img_spec, showing uv_rect of the image if given'''
+        if uv_rect is None and self.can_share_mesh(img_spec):
+            return object_data_add(context, self.shared_mesh_for_img_spec(img_spec), operator=self)
+
+        mesh = None
+        if self.mesh_mode == 'CONTOUR':
+            mesh = self.create_contour_mesh_for_img_spec(img_spec)
+
+        if mesh is None:
+            # check if mesh with image name allready exists, planes showing
+            # part of the image write their own UVs and need a mesh of their own
+            NAME = img_spec.image.name
+            reuse = self.reuse_existing and uv_rect is None
+            mesh = self.datablocks.get('meshes', NAME) if reuse else None
+            reused = mesh is not None
+            if mesh is None:
+                mesh = create_mesh(NAME)
+                self.datablocks.add(mesh)
+
+            if img_spec.size is None:
+                # square until the pixels load, nothing may read them now
+                set_mesh_verticies(mesh, (1, 1), self.origin)
+                defer_mesh_aspect(mesh, img_spec.image, self.origin)
+            else:
+                set_mesh_verticies(mesh, img_spec.size, self.origin)
+            if reused:
+                # an earlier UDIM or atlas import may have left tile offsets in it
+                set_plane_uvs(mesh, img_spec.size or (1, 1), self.origin)
+
+        if uv_rect is not None:
+            set_plane_uvs(mesh, img_spec.size, self.origin, uv_rect)
         plane_object = object_data_add(context, mesh, operator=self)
         return plane_object
 
-    # Take all image specs and loop over them
-    def all_image_specs_to_planes(self, context, image_specs):
+    def plane_specs_for_img_specs(self, image_specs):
+        '''all materials first, planes of the same image share its material'''
+        image_specs = list(image_specs)
+        batch = create_materials_for_img_specs(self, image_specs)
+        if bpy.app.debug:
+            print('Materials for {} plane(s): {}'.format(len(batch.materials), ', '.join(
+                '{} {:.3f} s'.format(phase, seconds) for phase, seconds in batch.timings.items())))
+        return [PlaneSpec(ispec, batch.materials[ispec], None) for ispec in image_specs]
+
+    def plane_specs_to_planes(self, context, plane_specs):
+        '''an object per plane'''
         finished_image_planes = []
-        for ispec in image_specs:
-            image_plane = self.single_image_spec_to_plane(context, ispec)
+        for plane_spec in plane_specs:
+            image_plane = self.create_mesh_object_for_img_spec(
+                context, plane_spec.img_spec, plane_spec.uv_rect)
+            link_plane_material(image_plane, plane_spec.material)
             finished_image_planes.append(image_plane)
-
         return finished_image_planes
 
     # Take image spec give finished plane with material back
-    def single_image_spec_to_plane(self, context, img_spec):
-        material = create_material_for_img_spec(self, img_spec)
+    def single_image_spec_to_plane(self, context, img_spec, material=None):
+        if material is None:
+            material = create_material_for_img_spec(self, img_spec)
         image_plane = self.create_mesh_object_for_img_spec(context, img_spec)
-        image_plane.data.materials.append(material)
+        link_plane_material(image_plane, material)
         return image_plane
 
 
@@ -134,26 +340,321 @@ class IIAP_OT_import_images_as_planes(IIAP_BASE_class, Operator, ImportHelper, A
         options={'HIDDEN', 'SKIP_SAVE'}
     )
 
+    use_directory: BoolProperty(
+        name='Import Directory',
+        default=False,
+        description='Import all images in the directory instead of the selected files'
+    )
+    max_depth: IntProperty(
+        name='Subdirectory Depth',
+        default=0,
+        min=-1,
+        description='Levels of subdirectories to import, -1 for no limit'
+    )
+    include_patterns: StringProperty(
+        name='Include',
+        default='',
+        description='Only import files matching one of these ";" separated patterns, e.g. "*_beauty*"'
+    )
+    exclude_patterns: StringProperty(
+        name='Exclude',
+        default='',
+        description='Skip files and directories matching one of these ";" separated patterns'
+    )
+
+    defer_pixels: BoolProperty(
+        name='Deferred Loading',
+        default=False,
+        description='Create images, materials and planes from file headers only, '
+                    'pixels load when the planes are first drawn or rendered. '
+                    'Not used for atlas packing, cut out planes stay quads'
+    )
+    packing: EnumProperty(
+        name='Packing',
+        items=[
+            ('NONE', 'None', 'One image and material per plane'),
+            ('ATLAS', 'Atlas', 'Pack single images into shared atlas images with one material each'),
+            ('UDIM', 'UDIM Tiles', 'Put single images on the tiles of one UDIM image and material, '
+                                   'files are linked, not copied (Blender 2.82 and later)'),
+        ],
+        description='Combine many small images to reduce images, materials and draw calls'
+    )
+    udim_location: EnumProperty(
+        name='UDIM Tiles',
+        items=[
+            ('BLEND', 'Next to .blend', 'Link the tiles into a UDIM folder next to the saved .blend file, '
+                                        'the add-on cache is used while it is unsaved'),
+            ('CACHE', 'Cache', 'Link the tiles into the add-on cache directory of this user'),
+        ],
+        description='Where the tile files of UDIM images are linked'
+    )
+    atlas_size: IntProperty(
+        name='Atlas Size',
+        default=4096,
+        min=256,
+        max=16384,
+        description='Maximum width and height of an atlas, larger images get their own material'
+    )
+    atlas_padding: IntProperty(
+        name='Atlas Padding',
+        default=2,
+        min=0,
+        max=64,
+        description='Pixels around each image, filled with its edge to avoid bleeding'
+    )
+    object_mode: EnumProperty(
+        name='Objects',
+        items=[
+            ('OBJECTS', 'One per Plane', 'Each plane is its own object'),
+            ('MERGED', 'Merged', 'All planes are quads of one mesh, laid out in a grid, '
+                                 'for imports where the number of objects slows Blender down'),
+            ('INSTANCED', 'Instanced', 'Planes sharing mesh and material are instanced at the vertices '
+                                       'of a point cloud object, for many planes of the same shape'),
+        ],
+        description='Create an object per plane or one object for all of them'
+    )
+    merged_face_maps: BoolProperty(
+        name='Face Maps per Image',
+        default=True,
+        description='Put the faces of each image of a merged object in a face map named after it'
+    )
+
     @classmethod
     def poll(cls, context):
         '''only in object mode?'''
         return context.mode == 'OBJECT'
 
+    def file_batches(self):
+        '''(subdirectory, file names) of the selection or the scanned tree'''
+        if not self.use_directory:
+            return [('', [f.name for f in self.files if f.name])]
+        extensions = bpy.path.extensions_image | bpy.path.extensions_movie
+        return scan_directory(
+            self.directory, extensions=extensions,
+            include=split_patterns(self.include_patterns),
+            exclude=split_patterns(self.exclude_patterns),
+            max_depth=self.max_depth)
+
+    def probed_batches(self, cache):
+        '''(directory, FileProbes) of each file_batches() batch'''
+        for subdirectory, filenames in self.file_batches():
+            directory = os.path.join(self.directory, subdirectory)
+            # existence check, stat and header parsing for all files in parallel
+            yield directory, probe_files(filenames, directory, cache=cache)
+
+    def import_files(self, context, probes, directory, cache):
+        '''PlaneSpecs for the probed files in directory'''
+        duplicates = {probe.filepath: self.duplicates[probe.filepath]
+                      for probe in probes if probe.filepath in self.duplicates}
+        filenames = [probe.filename for probe in probes
+                     if probe.exists and probe.filepath not in duplicates]
+
+        # only datablock creation is left for the main thread
+        # atlas packing has to read the pixels anyway, merged and instanced planes need their size
+        defer_pixels = (self.defer_pixels and self.packing != 'ATLAS'
+                        and self.object_mode == 'OBJECTS')
+        image_specs = load_images(filenames, directory, force_reload=not defer_pixels,
+                                  frame_start=1, find_sequences=self.use_sequence,
+                                  probes={probe.filename: probe for probe in probes},
+                                  cache=cache, defer_pixels=defer_pixels,
+                                  datablocks=self.datablocks, max_gap=self.sequence_gap)
+        if self.dedupe:
+            image_specs = with_duplicates(image_specs, directory, duplicates, self.imported_specs)
+        if self.packing == 'ATLAS':
+            return self.atlas_plane_specs(list(image_specs))
+        if self.packing == 'UDIM' and bpy.app.version >= UDIM_MIN_VERSION:
+            return self.udim_plane_specs(list(image_specs))
+        return self.plane_specs_for_img_specs(image_specs)
+
+    def find_duplicates(self, batches, cache):
+        '''duplicate file path -> identical file path in any batch, sequence frames are kept'''
+        single_probes = []
+        for _directory, probes in batches:
+            filenames = [probe.filename for probe in probes if probe.exists]
+            if self.use_sequence:
+                # held frames are often copies, they must stay in their sequence
+                singles = {frame_range.filename
+                           for frame_range in find_image_sequences(
+                               filenames, cache=cache, max_gap=self.sequence_gap)
+                           if not frame_range.is_sequence}
+            else:
+                singles = set(filenames)
+            single_probes += [probe for probe in probes if probe.filename in singles]
+        duplicates, saved = find_duplicates(single_probes, cache=cache)
+        self.deduped_files += len(duplicates)
+        self.deduped_bytes += saved
+        return duplicates
+
+    def atlas_plane_specs(self, image_specs):
+        '''planes sharing atlas images and materials, leftovers get their own'''
+        atlases, leftovers = pack_atlases(image_specs, self.atlas_size, self.atlas_padding)
+        plane_specs = self.plane_specs_for_img_specs(leftovers)
+
+        for atlas_spec, rects in atlases:
+            material = create_material_for_img_spec(self, atlas_spec)
+            for img_spec, rect in rects:
+                plane_specs.append(PlaneSpec(img_spec, material, atlas_uv_rect(rect, atlas_spec.size)))
+                # the pixels live in the atlas now
+                self.packed_images.append(img_spec.image)
+        return plane_specs
+
+    def udim_plane_specs(self, image_specs):
+        '''planes on the tiles of shared UDIM images, leftovers get their own'''
+        udims, leftovers = pack_udims(image_specs, tile_folder(self.udim_location))
+        plane_specs = self.plane_specs_for_img_specs(leftovers)
+
+        for udim_spec, tiles in udims:
+            material = create_material_for_img_spec(self, udim_spec)
+            for img_spec, tile in tiles:
+                plane_specs.append(PlaneSpec(img_spec, material, udim_uv_rect(tile)))
+                # the UDIM images load the files themselves
+                self.packed_images.append(img_spec.image)
+        return plane_specs
+
+    def merged_planes(self, context, plane_specs):
+        '''objects holding all planes, as few as the material slots allow'''
+        positions = grid_positions(len(plane_specs))
+        finished_image_planes = []
+        start = 0
+        while start < len(plane_specs):
+            materials = set()
+            end = start
+            for plane_spec in plane_specs[start:]:
+                if plane_spec.material not in materials and len(materials) == MAX_MERGED_MATERIALS:
+                    break
+                materials.add(plane_spec.material)
+                end += 1
+            finished_image_planes.append(self.merged_plane_object(
+                context, plane_specs[start:end], positions[start:end]))
+            start = end
+        return finished_image_planes
+
+    def instanced_planes(self, context, plane_specs):
+        '''a point cloud object per plane mesh and material used more than once, instancing that plane'''
+        positions = grid_positions(len(plane_specs))
+        groups = {}
+        for plane_spec, position in zip(plane_specs, positions):
+            img_spec = plane_spec.img_spec
+            if plane_spec.uv_rect is None and self.can_share_mesh(img_spec):
+                mesh_key = shared_mesh_key(img_spec.size, self.origin)
+            else:
+                mesh_key = img_spec.image.name  # its own mesh, see create_mesh_object_for_img_spec
+            key = (mesh_key, plane_spec.uv_rect, plane_spec.material)
+            groups.setdefault(key, (plane_spec, []))[1].append(position)
+
+        finished_image_planes = []
+        for plane_spec, points in groups.values():
+            if len(points) == 1:
+                # an instancer would only add a second object
+                finished_image_planes.append(self.placed_plane_object(context, plane_spec, points[0]))
+            else:
+                finished_image_planes.append(self.instancer_object(context, plane_spec, points))
+        return finished_image_planes
+
+    def placed_plane_object(self, context, plane_spec, point):
+        '''plane object of plane_spec at the (x, y) point of the instance grid'''
+        plane = self.create_mesh_object_for_img_spec(
+            context, plane_spec.img_spec, plane_spec.uv_rect)
+        link_plane_material(plane, plane_spec.material)
+        plane.location = plane.matrix_world @ Vector((*point, 0.0))
+        return plane
+
+    def instancer_object(self, context, plane_spec, points):
+        '''point cloud object at (x, y) points instancing the plane of plane_spec'''
+        template = self.create_mesh_object_for_img_spec(
+            context, plane_spec.img_spec, plane_spec.uv_rect)
+        link_plane_material(template, plane_spec.material)
+
+        mesh = bpy.data.meshes.new(template.name + '_instances')
+        mesh.vertices.add(len(points))
+        mesh.vertices.foreach_set('co', [co for x, y in points for co in (x, y, 0.0)])
+        self.datablocks.add(mesh)
+        instancer = object_data_add(context, mesh, operator=self)
+        instancer.instance_type = 'VERTS'
+
+        # both were placed the same, so the plane is at the origin of the instances
+        template.parent = instancer
+        template.matrix_parent_inverse = instancer.matrix_world.inverted()
+        return instancer
+
+    def merged_plane_object(self, context, plane_specs, positions):
+        '''one object with a quad per plane at positions'''
+        slots = {}
+        for plane_spec in plane_specs:
+            slots.setdefault(plane_spec.material, len(slots))
+        mesh = create_merged_mesh(
+            'Image Planes',
+            [plane_spec.img_spec.size for plane_spec in plane_specs],
+            positions, self.origin,
+            [plane_spec.uv_rect or (0.0, 0.0, 1.0, 1.0) for plane_spec in plane_specs],
+            [slots[plane_spec.material] for plane_spec in plane_specs])
+        for material in slots:
+            mesh.materials.append(material)
+        self.datablocks.add(mesh)
+
+        plane_object = object_data_add(context, mesh, operator=self)
+        # face maps were removed in Blender 4.0
+        if self.merged_face_maps and hasattr(plane_object, 'face_maps'):
+            face_maps = {}
+            for plane_spec in plane_specs:
+                face_maps.setdefault(plane_spec.img_spec.image.name, len(face_maps))
+            for name in face_maps:
+                plane_object.face_maps.new(name=name)
+            layer = mesh.face_maps.new()
+            layer.data.foreach_set(
+                'value', [face_maps[plane_spec.img_spec.image.name] for plane_spec in plane_specs])
+        return plane_object
+
+    def remove_unused_images(self, images):
+        '''remove source images no plane ended up using'''
+        for image in {image.name: image for image in images}.values():
+            if not image.users:
+                self.datablocks.discard(image)
+                bpy.data.images.remove(image)
+
     def execute(self, context):
         '''import image create imageplane'''
-        if not self.files:
+        if not self.use_directory and not self.files:
             print('No Files selected. CANCELLING')
             return {'CANCELLED'}
 
-        # existence check + use name
-        filenames = [f.name for f in self.files if os.path.exists(
-            os.path.join(self.directory, f.name))]
+        if self.packing == 'UDIM' and bpy.app.version < UDIM_MIN_VERSION:
+            self.report({'WARNING'}, 'UDIM tiles need Blender 2.82 or later, importing without packing')
+
+        cache = get_cache() if self.use_cache else None
+        self.deduped_files = self.deduped_bytes = 0
+        # fresh every run, redo undoes the datablocks of the last one
+        self.datablocks = DatablockIndex()
+
+        self.packed_images = []
+
+        # one directory at a time, the tree is scanned while importing
+        batches = self.probed_batches(cache)
+        self.duplicates = {}
+        self.imported_specs = {}
+        if self.dedupe:
+            # identical files can be in any directory, hash all of them first
+            batches = list(batches)
+            self.duplicates = self.find_duplicates(batches, cache)
+
+        plane_specs = []
+        for directory, probes in batches:
+            plane_specs += self.import_files(context, probes, directory, cache)
 
-        # filenames = [f.name for f in files]
-        image_specs = load_images(filenames, self.directory, force_reload=True,
-                                  frame_start=1, find_sequences=self.use_sequence)
-        finished_image_planes = self.all_image_specs_to_planes(
-            context, image_specs)
+        if cache is not None:
+            cache.flush()
+
+        if self.object_mode == 'MERGED':
+            finished_image_planes = self.merged_planes(context, plane_specs)
+        elif self.object_mode == 'INSTANCED':
+            finished_image_planes = self.instanced_planes(context, plane_specs)
+        else:
+            finished_image_planes = self.plane_specs_to_planes(context, plane_specs)
+        self.remove_unused_images(self.packed_images)
+
+        if self.deduped_files:
+            self.report({'INFO'}, '{} identical file(s) merged, {} saved'.format(
+                self.deduped_files, format_bytes(self.deduped_bytes)))
 
         if not finished_image_planes:
             print('No image planes created. CANCELLING')
@@ -162,7 +663,7 @@ class IIAP_OT_import_images_as_planes(IIAP_BASE_class, Operator, ImportHelper, A
         # Set new Planes as selected
         set_select(context, finished_image_planes)
 
-        if len(finished_image_planes) > 1:
+        if len(finished_image_planes) > 1 and self.object_mode == 'OBJECTS':
             # Use Arange Grid Operator to lay out
             bpy.ops.object.grid_arange()
 
@@ -177,6 +678,13 @@ def single_image_draw(self, context):
     col = layout.column()
     col.prop(self, 'materialtype')
     col.prop(self, 'alpha_mode')
+    col.prop(self, 'alpha_analysis')
+    col.prop(self, 'graded_blend')
+    col.prop(self, 'mesh_mode')
+    if self.mesh_mode == 'CONTOUR':
+        col.prop(self, 'contour_vertices')
+    else:
+        col.prop(self, 'share_meshes')
     col.prop(self, 'origin')
     col.prop(self, 'only_camera', toggle=True)
     col.prop(self, 'reuse_existing', toggle=True)
@@ -207,7 +715,8 @@ class IIAP_OT_image_to_plane(IIAP_BASE_class, Operator, AddObjectHelper):
     def execute(self, context):
         '''imageplane from image in image editor'''
         image = context.space_data.image
-        img_spec = ImageSpec(image, image.size, 1, 0, 1, image.use_alpha)
+        img_spec = ImageSpec(image, tuple(image.size), 1, 0, 1, image.use_alpha)
+        self.datablocks = DatablockIndex()
         image_plane = self.single_image_spec_to_plane(context, img_spec)
         set_select(context, [image_plane])
 
@@ -244,7 +753,8 @@ class IIAP_OT_texture_image_to_plane(IIAP_BASE_class, Operator, AddObjectHelper)
         '''imageplane from selected texture node'''
         sd = context.space_data
         image = sd.node_tree.nodes.active.image
-        img_spec = ImageSpec(image, image.size, 1, 0, 1, image.use_alpha)
+        img_spec = ImageSpec(image, tuple(image.size), 1, 0, 1, image.use_alpha)
+        self.datablocks = DatablockIndex()
         image_plane = self.single_image_spec_to_plane(context, img_spec)
         set_select(context, [image_plane])
 
@@ -278,6 +788,7 @@ def btn_texture_image_to_plane(self, context):
 
 def register():
     from bpy.utils import register_class
+    register_deferred()
     register_class(IIAP_OT_import_images_as_planes)
     register_class(IIAP_OT_texture_image_to_plane)
     register_class(IIAP_OT_image_to_plane)
@@ -297,6 +808,8 @@ def unregister():
     unregister_class(IIAP_OT_texture_image_to_plane)
     unregister_class(IIAP_OT_import_images_as_planes)
 
+    unregister_deferred()
+
     bpy.types.VIEW3D_MT_image_add.remove(btn_import_images)
     bpy.types.VIEW3D_MT_mesh_add.remove(btn_import_images)
     bpy.types.TOPBAR_MT_file_import.remove(btn_import_images)
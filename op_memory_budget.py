@@ -0,0 +1,101 @@
+import bpy
+from bpy.props import (
+    FloatProperty,
+    IntProperty,
+)
+from bpy.types import (
+    AddonPreferences,
+    Operator,
+)
+
+from .util_memory import (
+    RENDER_HANDLERS,
+    enforce_budget,
+    managed_memory,
+)
+
+MIB = 1024 * 1024
+
+
+def get_preferences(context=None):
+    context = context or bpy.context
+    addon = context.preferences.addons.get(__package__)
+    return addon.preferences if addon else None
+
+
+class IIAP_preferences(AddonPreferences):
+    bl_idname = __package__
+
+    memory_budget: IntProperty(
+        name='Image Memory Budget (MiB)',
+        default=4096,
+        min=0,
+        description='Free pixels of imported images not seen recently above this size, 0 for no limit'
+    )
+    check_interval: FloatProperty(
+        name='Check Interval',
+        default=2.0,
+        min=0.2,
+        max=60.0,
+        subtype='TIME',
+        unit='TIME',
+        description='Seconds between memory budget checks'
+    )
+
+    def draw(self, context):
+        layout = self.layout
+        row = layout.row()
+        row.prop(self, 'memory_budget')
+        row.prop(self, 'check_interval')
+        size, count = managed_memory()
+        layout.label(text='{} imported image(s) loaded, about {:.0f} MiB'.format(count, size / MIB))
+        layout.operator(IIAP_OT_free_image_memory.bl_idname)
+
+
+def budget_watcher():
+    '''timer: enforce the budget, idle without a limit'''
+    prefs = get_preferences()
+    if prefs is None:
+        return 10.0
+    if prefs.memory_budget:
+        enforce_budget(prefs.memory_budget * MIB)
+    return prefs.check_interval
+
+
+class IIAP_OT_free_image_memory(Operator):
+    """Free pixels of imported images that are not visible"""
+    bl_idname = 'image.free_image_memory'
+    bl_label = 'Free image memory'
+    bl_description = 'Free the pixels of imported images not on visible objects'
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    def execute(self, context):
+        freed = enforce_budget(0)
+        self.report({'INFO'}, 'Freed about {:.0f} MiB'.format(freed / MIB))
+        return {'FINISHED'}
+
+def register():
+    from bpy.utils import register_class
+    register_class(IIAP_preferences)
+    register_class(IIAP_OT_free_image_memory)
+    for name, handler in RENDER_HANDLERS:
+        getattr(bpy.app.handlers, name).append(handler)
+    bpy.app.timers.register(budget_watcher, first_interval=2.0, persistent=True)
+
+def unregister():
+    from bpy.utils import unregister_class
+    if bpy.app.timers.is_registered(budget_watcher):
+        bpy.app.timers.unregister(budget_watcher)
+    for name, handler in RENDER_HANDLERS:
+        handlers = getattr(bpy.app.handlers, name)
+        if handler in handlers:
+            handlers.remove(handler)
+    unregister_class(IIAP_OT_free_image_memory)
+    unregister_class(IIAP_preferences)
+
+if __name__ == "__main__":
+    register()
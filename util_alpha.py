@@ -0,0 +1,77 @@
+'''classify the alpha channel of images to pick the cheapest blend mode'''
+
+import os
+
+import bpy
+import numpy as np
+
+ALPHA_KEY = 'iiap_alpha'
+ALPHA_EPSILON = 0.5 / 255  # anything closer to 0 or 1 is treated as exact
+MAX_SAMPLES = 1 << 16
+
+
+def classify_alpha_values(alpha):
+    """'OPAQUE', 'BINARY' (only 0 and 1) or 'GRADED' for an array of alpha values.
+
+    >>> classify_alpha_values(np.array([1.0, 1.0])), classify_alpha_values(np.array([0.0, 1.0]))
+    ('OPAQUE', 'BINARY')
+    >>> classify_alpha_values(np.array([0.0, 0.5, 1.0]))
+    'GRADED'
+    """
+    if alpha.size == 0 or alpha.min() >= 1.0 - ALPHA_EPSILON:
+        return 'OPAQUE'
+    partial = (alpha > ALPHA_EPSILON) & (alpha < 1.0 - ALPHA_EPSILON)
+    return 'GRADED' if partial.any() else 'BINARY'
+
+
+def read_alpha(image):
+    '''alpha of image as a (height, width) array, None without alpha channel'''
+    width, height = image.size
+    channels = image.channels
+    if channels not in (2, 4) or not width or not height:
+        return None
+    pixels = np.empty(width * height * channels, dtype=np.float32)
+    try:
+        image.pixels.foreach_get(pixels)
+    except AttributeError:  # Blender before 2.83
+        pixels[:] = image.pixels[:]
+    return pixels[channels - 1::channels].reshape(height, width)
+
+
+def file_signature(image):
+    '''(absolute path, mtime, size) of image's file, times and size are -1 if unreadable'''
+    filepath = os.path.normpath(bpy.path.abspath(image.filepath, library=image.library))
+    try:
+        stat = os.stat(filepath)
+    except (OSError, ValueError):
+        return filepath, -1.0, -1.0
+    # ID properties hold 32 bit integers, a double keeps sizes exact
+    return filepath, stat.st_mtime, float(stat.st_size)
+
+
+def classify_alpha(image, sampled=True):
+    """Classify image's alpha, cached in the image until its file changes.
+
+    Blender only hands out all pixels at once, so they are decoded and
+    copied in full either way. Sampled only classifies about MAX_SAMPLES
+    evenly spread pixels, which can miss small soft edges, full checks
+    every pixel.
+    """
+    filepath, mtime, size = file_signature(image)
+    cached = image.get(ALPHA_KEY)
+    if (cached and cached.get('filepath') == filepath and cached.get('mtime') == mtime
+            and cached.get('size') == size and (cached.get('sampled') == 0 or sampled)):
+        return cached['class']
+
+    alpha = read_alpha(image)
+    if alpha is None:
+        result = 'OPAQUE'
+    else:
+        alpha = alpha.ravel()
+        if sampled and alpha.size > MAX_SAMPLES:
+            alpha = alpha[::alpha.size // MAX_SAMPLES]
+        result = classify_alpha_values(alpha)
+
+    image[ALPHA_KEY] = {'class': result, 'filepath': filepath, 'mtime': mtime, 'size': size,
+                        'sampled': int(sampled)}
+    return result
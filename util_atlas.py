@@ -0,0 +1,193 @@
+'''pack many small images into shared atlas images'''
+
+import bpy
+import numpy as np
+
+from .util_load_images import ImageSpec
+from .util_memory import manage_image
+
+
+# -----------------------------------------------------------------------------
+# Rectangle packing
+
+class MaxRectsBin:
+    """MaxRects bin packer with the best short side fit heuristic.
+
+    Keeps every maximal free rectangle, so placements can use space left
+    of and below earlier ones. Rects are (x, y, width, height).
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.free = [(0, 0, width, height)]
+
+    def insert(self, width, height):
+        '''place a rect and return its (x, y) or None if it doesn't fit'''
+        best = None
+        for x, y, free_width, free_height in self.free:
+            if width <= free_width and height <= free_height:
+                leftover = sorted((free_width - width, free_height - height))
+                if best is None or leftover < best[0]:
+                    best = (leftover, x, y)
+        if best is None:
+            return None
+        _leftover, x, y = best
+        self._place((x, y, width, height))
+        return x, y
+
+    def _place(self, used):
+        ux, uy, uw, uh = used
+        free = []
+        for rect in self.free:
+            x, y, w, h = rect
+            if ux >= x + w or ux + uw <= x or uy >= y + h or uy + uh <= y:
+                free.append(rect)
+                continue
+            # Split into the up to four maximal rects around the used one
+            if ux > x:
+                free.append((x, y, ux - x, h))
+            if ux + uw < x + w:
+                free.append((ux + uw, y, x + w - ux - uw, h))
+            if uy > y:
+                free.append((x, y, w, uy - y))
+            if uy + uh < y + h:
+                free.append((x, uy + uh, w, y + h - uy - uh))
+
+        # Drop rects contained in others
+        free.sort(key=lambda rect: rect[2] * rect[3], reverse=True)
+        self.free = []
+        for x, y, w, h in free:
+            if not any(fx <= x and fy <= y and x + w <= fx + fw and y + h <= fy + fh
+                       for fx, fy, fw, fh in self.free):
+                self.free.append((x, y, w, h))
+
+
+def pack_rects(sizes, bin_size, padding=0):
+    """Pack (width, height) sizes into as few square bins as needed.
+
+    Returns (bin index, x, y) of the padded rect for every size, or None
+    for sizes that don't fit into a bin at all. Large rects go first.
+
+    >>> pack_rects([(2, 2), (1, 1), (5, 1), (1, 2)], 4)
+    [(0, 0, 0), (0, 1, 2), None, (0, 0, 2)]
+    """
+    placements = [None] * len(sizes)
+    bins = []
+    order = sorted(range(len(sizes)), key=lambda i: max(sizes[i]), reverse=True)
+    for i in order:
+        width, height = (side + 2 * padding for side in sizes[i])
+        if width > bin_size or height > bin_size:
+            continue
+        for index, packer in enumerate(bins):
+            position = packer.insert(width, height)
+            if position is not None:
+                break
+        else:
+            bins.append(MaxRectsBin(bin_size, bin_size))
+            index = len(bins) - 1
+            position = bins[index].insert(width, height)
+        placements[i] = (index, *position)
+    return placements
+
+
+# -----------------------------------------------------------------------------
+# Atlas images
+
+def read_pixels(image):
+    '''pixels of image as a (height, width, 4) float32 array, expanded to RGBA'''
+    width, height = image.size
+    channels = image.channels
+    pixels = np.empty(width * height * channels, dtype=np.float32)
+    try:
+        image.pixels.foreach_get(pixels)
+    except AttributeError:  # Blender before 2.83
+        pixels[:] = image.pixels[:]
+    pixels = pixels.reshape(height, width, channels)
+    if channels == 4:
+        return pixels
+
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    if channels < 3:  # gray, with alpha if there are 2
+        rgba[..., :3] = pixels[..., :1]
+        if channels == 2:
+            rgba[..., 3] = pixels[..., 1]
+    else:
+        rgba[..., :3] = pixels[..., :3]
+    return rgba
+
+
+def can_share_atlas(img_spec, max_size, padding):
+    '''single frame images that fit into an atlas'''
+    return (img_spec.image.source == 'FILE'
+            and img_spec.frame_duration == 1
+            and max(img_spec.size) + 2 * padding <= max_size)
+
+
+def pack_atlases(img_specs, max_size=4096, padding=2, name='Atlas'):
+    """Copy the images of img_specs into as few atlas images as possible.
+
+    Byte and float images go into separate atlases, so colors keep their
+    color space. Padding is filled with the image's edge pixels to avoid
+    bleeding with texture filtering.
+    Returns ([(atlas ImageSpec, [(img_spec, (x, y, width, height))])],
+    img_specs that don't fit). Rects are in pixels of the atlas.
+    """
+    leftovers = [spec for spec in img_specs if not can_share_atlas(spec, max_size, padding)]
+    # Specs sharing an image share its rect
+    shared = {}
+    for spec in img_specs:
+        if can_share_atlas(spec, max_size, padding):
+            shared.setdefault(spec.image.name, []).append(spec)
+    groups = {}
+    for spec, *_others in shared.values():
+        is_float = (spec.bit_depth or 8) > 8 or spec.image.is_float
+        groups.setdefault(is_float, []).append(spec)
+
+    atlases = []
+    for is_float, specs in groups.items():
+        placements = pack_rects([spec.size for spec in specs], max_size, padding)
+        for bin_index in sorted({placement[0] for placement in placements}):
+            members = [(spec, placement[1:]) for spec, placement in zip(specs, placements)
+                       if placement[0] == bin_index]
+            atlas_spec, rects = build_atlas(name, members, padding, is_float)
+            rects = [(other, rect) for spec, rect in rects for other in shared[spec.image.name]]
+            atlases.append((atlas_spec, rects))
+    return atlases, leftovers
+
+
+def build_atlas(name, members, padding, is_float):
+    '''create one packed atlas image from (img_spec, (x, y)) members'''
+    # Crop the bin to what is used
+    width = max(x + spec.size[0] + 2 * padding for spec, (x, y) in members)
+    height = max(y + spec.size[1] + 2 * padding for spec, (x, y) in members)
+
+    pixels = np.zeros((height, width, 4), dtype=np.float32)
+    rects = []
+    for spec, (x, y) in members:
+        source = read_pixels(spec.image)
+        if padding:
+            source = np.pad(source, ((padding, padding), (padding, padding), (0, 0)), mode='edge')
+        pixels[y:y + source.shape[0], x:x + source.shape[1]] = source
+        rects.append((spec, (x + padding, y + padding, *spec.size)))
+
+    use_alpha = any(spec.use_alpha for spec, _rect in members)
+    atlas = bpy.data.images.new(name, width, height, alpha=use_alpha, float_buffer=is_float)
+    atlas.pixels.foreach_set(pixels.ravel())
+    atlas.pack()
+    atlas.use_alpha = use_alpha
+    manage_image(atlas)
+
+    atlas_spec = ImageSpec(atlas, (width, height), 1, 0, 1, use_alpha, 4, 32 if is_float else 8)
+    return atlas_spec, rects
+
+
+def atlas_uv_rect(rect, atlas_size):
+    """(u0, v0, u1, v1) of a pixel rect in the atlas.
+
+    >>> atlas_uv_rect((2, 0, 2, 4), (8, 4))
+    (0.25, 0.0, 0.5, 1.0)
+    """
+    x, y, width, height = rect
+    return (x / atlas_size[0], y / atlas_size[1],
+            (x + width) / atlas_size[0], (y + height) / atlas_size[1])
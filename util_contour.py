@@ -0,0 +1,179 @@
+'''trace the alpha outline of images to build cut-out meshes'''
+
+from math import ceil
+
+import numpy as np
+
+from .util_alpha import ALPHA_EPSILON
+
+CONTOUR_RESOLUTION = 128  # mask cells along the longer image side
+MIN_LOOP_AREA = 2.0  # in mask cells, smaller islands and holes are dropped
+
+# -----------------------------------------------------------------------------
+# Marching squares
+#
+# Cell corners are bit flags: bottom left 1, bottom right 2, top right 4,
+# top left 8. Segments run between edge midpoints (B)ottom, (R)ight, (T)op
+# and (L)eft with the inside on their left, so outlines are counter
+# clockwise and holes clockwise. Saddles (5, 10) keep the inside corners
+# apart. Midpoints are in doubled cell coordinates to stay integers.
+
+MIDPOINTS = {'B': (1, 0), 'R': (2, 1), 'T': (1, 2), 'L': (0, 1)}
+CASE_SEGMENTS = {
+    1: ['BL'], 2: ['RB'], 3: ['RL'], 4: ['TR'], 5: ['BL', 'TR'], 6: ['TB'], 7: ['TL'],
+    8: ['LT'], 9: ['BT'], 10: ['RB', 'LT'], 11: ['RT'], 12: ['LR'], 13: ['BR'], 14: ['LB'],
+}
+
+
+def downsample_mask(alpha, resolution=CONTOUR_RESOLUTION):
+    """Boolean mask of non transparent pixels, at most resolution cells wide.
+
+    A cell is set if any of its pixels is, so the outline never cuts into
+    the image, and the mask is grown by one cell to leave room for the
+    simplification. Returns the mask and the cell size in pixels.
+    """
+    height, width = alpha.shape
+    block = max(1, ceil(max(width, height) / resolution))
+    rows, columns = ceil(height / block), ceil(width / block)
+    padded = np.zeros((rows * block, columns * block), dtype=bool)
+    padded[:height, :width] = alpha > ALPHA_EPSILON
+    mask = padded.reshape(rows, block, columns, block).any(axis=(1, 3))
+
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown, block
+
+
+def marching_squares(mask):
+    """Closed outlines of mask as lists of (x, y) in mask cell units.
+
+    Row 0 of mask is the bottom, like image pixels in Blender. Points lie
+    on cell borders, between 0 and the mask width / height.
+
+    >>> marching_squares(np.array([[1, 1], [1, 0]], dtype=bool))
+    [[(0.0, 0.5), (0.5, 0.0), (1.5, 0.0), (2.0, 0.5), (1.5, 1.0), (1.0, 1.5), (0.5, 2.0), (0.0, 1.5)]]
+    """
+    m = np.pad(mask, 1).astype(np.uint8)
+    cases = m[:-1, :-1] | m[:-1, 1:] << 1 | m[1:, 1:] << 2 | m[1:, :-1] << 3
+    stride = 2 * cases.shape[1] + 3
+
+    starts = []
+    ends = []
+    for case, segments in CASE_SEGMENTS.items():
+        rows, columns = np.nonzero(cases == case)
+        for start, end in segments:
+            for points, name in ((starts, start), (ends, end)):
+                dx, dy = MIDPOINTS[name]
+                points.append((2 * rows + dy) * stride + 2 * columns + dx)
+    if not starts:
+        return []
+    following = dict(zip(np.concatenate(starts).tolist(), np.concatenate(ends).tolist()))
+
+    loops = []
+    while following:
+        first, point = following.popitem()
+        loop = [first]
+        while point != first:
+            loop.append(point)
+            point = following.pop(point)
+        # back from doubled padded coordinates to cell borders
+        loops.append([((key % stride) / 2 - 0.5, (key // stride) / 2 - 0.5) for key in loop])
+    loops.sort()
+    return [loop[loop.index(min(loop)):] + loop[:loop.index(min(loop))] for loop in loops]
+
+
+# -----------------------------------------------------------------------------
+# Simplification
+
+def signed_area(loop):
+    '''positive for counter clockwise loops'''
+    points = np.asarray(loop)
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def douglas_peucker(points, epsilon):
+    '''indices of points to keep on an open polyline'''
+    points = np.asarray(points, dtype=np.float64)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        direction = end - start
+        length = np.hypot(*direction)
+        between = points[first + 1:last] - start
+        if length:
+            distances = np.abs(between[:, 0] * direction[1] - between[:, 1] * direction[0]) / length
+        else:
+            distances = np.hypot(between[:, 0], between[:, 1])
+        index = int(np.argmax(distances))
+        if distances[index] > epsilon:
+            middle = first + 1 + index
+            keep[middle] = True
+            stack.append((first, middle))
+            stack.append((middle, last))
+    return np.nonzero(keep)[0]
+
+
+def simplify_loop(loop, epsilon):
+    """Douglas-Peucker on a closed loop, split at the point farthest from the first.
+
+    >>> simplify_loop([(0, 0), (1, 0), (2, 0), (2, 1), (2, 2), (1, 2), (0, 2), (0, 1)], 0.1)
+    [(0, 0), (2, 0), (2, 2), (0, 2)]
+    """
+    points = np.asarray(loop, dtype=np.float64)
+    far = int(np.argmax(np.hypot(*(points - points[0]).T)))
+    closed = np.vstack((points, points[:1]))
+    first = douglas_peucker(closed[:far + 1], epsilon)
+    second = douglas_peucker(closed[far:], epsilon) + far
+    indices = np.concatenate((first, second[1:-1]))
+    return [loop[i] for i in indices]
+
+
+def simplify_loops(loops, max_vertices):
+    """Simplify loops until they have at most max_vertices points together.
+
+    The smallest tolerance that fits is found by bisection.
+    """
+    loops = [loop for loop in loops if abs(signed_area(loop)) >= MIN_LOOP_AREA]
+    if sum(map(len, loops)) <= max_vertices:
+        return loops
+
+    def simplified(epsilon):
+        result = [simplify_loop(loop, epsilon) for loop in loops]
+        return [loop for loop in result if len(loop) >= 3]
+
+    low, high = 0.0, 1.0
+    while sum(map(len, simplified(high))) > max_vertices and high < 1e4:
+        low, high = high, high * 2
+    for _ in range(12):
+        middle = (low + high) / 2
+        if sum(map(len, simplified(middle))) > max_vertices:
+            low = middle
+        else:
+            high = middle
+    return simplified(high)
+
+
+def alpha_contour(alpha, max_vertices=64, resolution=CONTOUR_RESOLUTION):
+    """Outlines of the visible part of an alpha array as UV loops.
+
+    Returns lists of (u, v) between 0 and 1, counter clockwise outlines and
+    clockwise holes, or None if the image has no transparent border to cut.
+    """
+    mask, block = downsample_mask(alpha, resolution)
+    if mask.all() or not mask.any():
+        return None
+    loops = simplify_loops(marching_squares(mask), max_vertices)
+    if not loops:
+        return None
+    height, width = alpha.shape
+    return [[(min(1.0, x * block / width), min(1.0, y * block / height)) for x, y in loop]
+            for loop in loops]
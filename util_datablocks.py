@@ -0,0 +1,77 @@
+'''look up datablocks by name or image path without scanning bpy.data each time'''
+
+import os
+
+import bpy
+
+
+def normalized_path(filepath, library=None):
+    '''absolute, normalized form of a possibly relative (//) file path'''
+    return os.path.normcase(os.path.normpath(bpy.path.abspath(filepath, library=library)))
+
+
+class DatablockIndex:
+    """Images, materials and meshes by name and images by file path.
+
+    Each collection is read once on first use, datablocks created later
+    are added with add(). Build a new index per operator execution: the
+    stored datablocks are invalid after an undo step.
+    """
+
+    COLLECTIONS = {
+        bpy.types.Image: 'images',
+        bpy.types.Material: 'materials',
+        bpy.types.Mesh: 'meshes',
+    }
+
+    def __init__(self):
+        self._names = {}
+        self._image_paths = None
+        self._image_keys = {}  # image -> its entry in _image_paths
+
+    def _by_name(self, collection):
+        names = self._names.get(collection)
+        if names is None:
+            names = {datablock.name: datablock for datablock in getattr(bpy.data, collection)}
+            self._names[collection] = names
+        return names
+
+    def get(self, collection, name):
+        '''datablock called name in 'images', 'materials' or 'meshes', or None'''
+        return self._by_name(collection).get(name)
+
+    def image_by_filepath(self, filepath):
+        '''an image loaded from filepath, or None'''
+        if self._image_paths is None:
+            self._image_paths = {}
+            for image in bpy.data.images:
+                if image.source in {'FILE', 'SEQUENCE', 'MOVIE'} and image.filepath:
+                    self._add_image_path(image)
+        return self._image_paths.get(normalized_path(filepath))
+
+    def add(self, datablock):
+        '''record a new or renamed datablock'''
+        collection = self.COLLECTIONS[type(datablock)]
+        if collection in self._names:
+            self._names[collection][datablock.name] = datablock
+        if collection == 'images' and self._image_paths is not None and datablock.filepath:
+            self._add_image_path(datablock)
+
+    def _add_image_path(self, image):
+        path = normalized_path(image.filepath, image.library)
+        if path not in self._image_paths:
+            old_path = self._image_keys.get(image)
+            if old_path is not None:  # the file path changed
+                del self._image_paths[old_path]
+            self._image_paths[path] = image
+            self._image_keys[image] = path
+
+    def discard(self, datablock):
+        '''forget a datablock before it is removed'''
+        collection = self.COLLECTIONS[type(datablock)]
+        names = self._names.get(collection)
+        if names is not None and names.get(datablock.name) == datablock:
+            del names[datablock.name]
+        path = self._image_keys.pop(datablock, None)
+        if path is not None:
+            del self._image_paths[path]
@@ -0,0 +1,65 @@
+'''fix up planes of images whose size is only known once their pixels load'''
+
+import bpy
+
+from .util_mesh import set_mesh_verticies
+
+DEFERRED_CHECK_INTERVAL = 1.0  # seconds
+
+# Meshes waiting for their image, found again through their ID properties
+# after a file is loaded
+_pending = set()
+
+
+def defer_mesh_aspect(mesh, image, origin):
+    '''give mesh the aspect of image once Blender loaded its pixels'''
+    mesh['iiap_deferred_image'] = image.name
+    mesh['iiap_deferred_origin'] = origin
+    _pending.add(mesh.name)
+    if not bpy.app.timers.is_registered(check_deferred_meshes):
+        bpy.app.timers.register(
+            check_deferred_meshes, first_interval=DEFERRED_CHECK_INTERVAL, persistent=True)
+
+
+def check_deferred_meshes():
+    """Timer: update meshes whose image got drawn or rendered.
+
+    Only has_data is checked, that never loads pixels itself.
+    """
+    for name in list(_pending):
+        mesh = bpy.data.meshes.get(name)
+        image = mesh and bpy.data.images.get(mesh.get('iiap_deferred_image', ''))
+        if image is None:
+            _pending.discard(name)
+            continue
+        if not image.has_data:
+            continue
+        if 0 not in image.size:
+            set_mesh_verticies(mesh, image.size, mesh['iiap_deferred_origin'])
+        del mesh['iiap_deferred_image']
+        del mesh['iiap_deferred_origin']
+        _pending.discard(name)
+    return DEFERRED_CHECK_INTERVAL if _pending else None
+
+
+@bpy.app.handlers.persistent
+def find_deferred_meshes(*args):
+    '''pick up meshes still waiting in a loaded file'''
+    _pending.clear()
+    for mesh in bpy.data.meshes:
+        if 'iiap_deferred_image' in mesh:
+            _pending.add(mesh.name)
+    if _pending and not bpy.app.timers.is_registered(check_deferred_meshes):
+        bpy.app.timers.register(
+            check_deferred_meshes, first_interval=DEFERRED_CHECK_INTERVAL, persistent=True)
+
+
+def register_deferred():
+    bpy.app.handlers.load_post.append(find_deferred_meshes)
+
+
+def unregister_deferred():
+    bpy.app.handlers.load_post.remove(find_deferred_meshes)
+    if bpy.app.timers.is_registered(check_deferred_meshes):
+        bpy.app.timers.unregister(check_deferred_meshes)
+    _pending.clear()
@@ -1,114 +1,111 @@
-import re
+import os
 from collections import namedtuple
-from itertools import count, repeat
 
 from bpy_extras.image_utils import load_image
 
+from .util_memory import manage_image
+from .util_node_patch import set_changed
+from .util_probe_images import probe_file
+from .util_sequences import (
+    MAX_GAP,
+    FrameRange,
+    find_image_sequences,
+)
+
 # -----------------------------------------------------------------------------
 # Image loading
 
 ImageSpec = namedtuple(
     'ImageSpec',
-    ['image', 'size', 'frame_start', 'frame_offset', 'frame_duration', 'use_alpha'])
-
-num_regex = re.compile('[0-9]')  # Find a single number
-nums_regex = re.compile('[0-9]+')  # Find a set of numbers
-
-
-def find_image_sequences(files):
-    """From a group of files, detect image sequences.
-
-    This returns a generator of tuples, which contain the filename,
-    start frame, and length of the detected sequence
-
-    >>> list(find_image_sequences([
-    ...     "test2-001.jp2", "test2-002.jp2",
-    ...     "test3-003.jp2", "test3-004.jp2", "test3-005.jp2", "test3-006.jp2",
-    ...     "blaah"]))
-    [('blaah', 1, 1), ('test2-001.jp2', 1, 2), ('test3-003.jp2', 3, 4)]
-
-    """
-    files = iter(sorted(files))
-    prev_file = None
-    pattern = ""
-    matches = []
-    segment = None
-    length = 1
-    for filename in files:
-        new_pattern = num_regex.sub('#', filename)
-        new_matches = list(map(int, nums_regex.findall(filename)))
-        if new_pattern == pattern:
-            # this file looks like it may be in sequence from the previous
-
-            # if there are multiple sets of numbers, figure out what changed
-            if segment is None:
-                for i, prev, cur in zip(count(), matches, new_matches):
-                    if prev != cur:
-                        segment = i
-                        break
-
-            # did it only change by one?
-            for i, prev, cur in zip(count(), matches, new_matches):
-                if i == segment:
-                    # We expect this to increment
-                    prev = prev + length
-                if prev != cur:
-                    break
-
-            # All good!
-            else:
-                length += 1
-                continue
-
-        # No continuation -> spit out what we found and reset counters
-        if prev_file:
-            if length > 1:
-                yield prev_file, matches[segment], length
-            else:
-                yield prev_file, 1, 1
-
-        prev_file = filename
-        matches = new_matches
-        pattern = new_pattern
-        segment = None
-        length = 1
-
-    if prev_file:
-        if length > 1:
-            yield prev_file, matches[segment], length
-        else:
-            yield prev_file, 1, 1
+    ['image', 'size', 'frame_start', 'frame_offset', 'frame_duration', 'use_alpha',
+     'channels', 'bit_depth', 'frame_range', 'fps'],
+    defaults=(None, None, None, None))
 
 
-def load_images(filenames, directory, force_reload=True, frame_start=1, find_sequences=True):
+def load_images(filenames, directory, force_reload=True, frame_start=1, find_sequences=True,
+                probes=None, cache=None, defer_pixels=False, datablocks=None, max_gap=MAX_GAP):
     """Wrapper for bpy's load_image
 
     Loads a set of images, movies, or even image sequences
     Returns a generator of ImageSpec wrapper objects later used for texture setup
+
+    Size and alpha are read from the file header where possible, so the
+    pixels are only decoded once the texture is actually displayed.
+    probes optionally maps filenames to FileProbe results from probe_files,
+    cache is an optional ProbeCache for headers and sequence groupings.
+    With defer_pixels nothing is decoded even for unknown formats: their
+    size is None and alpha is assumed until Blender loads the pixels.
+    datablocks is an optional DatablockIndex to find loaded images by path.
+    max_gap is the largest frame jump inside a detected sequence.
     """
     if find_sequences:  # if finding sequences, we need some pre-processing first
-        file_iter = find_image_sequences(filenames)
+        file_iter = find_image_sequences(filenames, cache=cache, max_gap=max_gap)
     else:
-        file_iter = zip(filenames, repeat(1), repeat(1))
+        file_iter = map(FrameRange.single, filenames)
 
-    for filename, offset, frames in file_iter:
-        image = load_image(filename, directory,
-                           check_existing=True, force_reload=force_reload)
-        image.use_alpha = True if image.depth == 32 else False
-
-        # Size is unavailable for sequences, so we grab it early
-        size = tuple(image.size)
+    for frame_range in file_iter:
+        filename = frame_range.filename
+        if probes is not None and filename in probes:
+            header = probes[filename].header
+        else:
+            header = probe_file(filename, directory, cache=cache).header
+        image = None
+        if datablocks is not None:
+            image = datablocks.image_by_filepath(os.path.join(directory, filename))
+            if image is not None and force_reload:
+                image.reload()
+        if image is None:
+            image = load_image(filename, directory,
+                               check_existing=True, force_reload=force_reload)
+            if datablocks is not None:
+                datablocks.add(image)
+        manage_image(image)
+
+        if header is not None:
+            size = header.size
+            use_alpha = header.has_alpha
+            channels = header.channels
+            bit_depth = header.bit_depth
+        elif defer_pixels:
+            size = None
+            use_alpha = True
+            channels = bit_depth = None
+        else:
+            # Unknown format: let Blender decode the image to find out
+            # Size is unavailable for sequences, so we grab it early
+            size = tuple(image.size)
+            use_alpha = image.depth == 32
+            channels = image.channels
+            bit_depth = image.depth // max(channels, 1)
+        set_changed(image, 'use_alpha', use_alpha)  # writing reloads a reused image
         if size == (0, 0):
             continue
 
-        if image.source == 'MOVIE':
+        fps = None
+        if image.source == 'MOVIE' and header is not None and header.frame_count:
+            # From the container, asking Blender would open the movie in FFmpeg
+            frames = header.frame_count
+            fps = header.fps
+
+        elif image.source == 'MOVIE':
             # Blender BPY BUG!
             # This number is only valid when read a second time in 2.77
             # This repeated line is not a mistake
             frames = image.frame_duration
             frames = image.frame_duration
 
-        elif frames > 1:  # Not movie, but multiple frames -> image sequence
-            image.source = 'SEQUENCE'
+        else:
+            frames = frame_range.duration
+            if frames > 1:  # Not movie, but multiple frames -> image sequence
+                image.source = 'SEQUENCE'
+            if frame_range.step > 1 or frame_range.missing:
+                # Read by add_sequence_keyframes to hold frames over gaps
+                image['iiap_frame_range'] = [
+                    frame_range.start, frame_range.end, frame_range.step,
+                    *(frame for pair in frame_range.missing for frame in pair)]
+            else:
+                # a reloaded image may have lost its gaps
+                image.pop('iiap_frame_range', None)
 
-        yield ImageSpec(image, size, frame_start, offset - 1, frames, image.use_alpha)
+        yield ImageSpec(image, size, frame_start, frame_range.start - 1, frames, use_alpha,
+                        channels, bit_depth, frame_range, fps)
@@ -1,5 +1,19 @@
+import time
+from collections import namedtuple
+
 import bpy
 
+from .util_alpha import classify_alpha
+from .util_node_patch import (
+    patch_material,
+    set_changed,
+)
+from .util_sequences import FrameRange
+
+TEMPLATE_PREFIX = '.IAP_template_v'
+TEMPLATE_VERSION = 1  # bump when build_material_nodes changes
+IMAGE_NODE = 'IAP_IMAGE'
+
 
 def hide_socket_toggle(node):
     for socket in node.outputs:
@@ -7,13 +21,117 @@ def hide_socket_toggle(node):
             socket.hide = not socket.hide
 
 
-def create_nodes_for_material(self, img_spec, material):
-    '''return emission material without alpha'''
-    img = img_spec.image
+def sequence_offset_keys(frame_range, frame_start):
+    '''(scene frame, frame offset) where the offset holding frames over gaps changes'''
+    keys = []
+    for shown in range(1, frame_range.duration + 1):
+        # Without an offset Blender shows the file numbered frame - frame_start + 1
+        offset = frame_range.held_frame(shown + frame_range.start - 1) - shown
+        if not keys or keys[-1][1] != offset:
+            keys.append((frame_start + shown - 1, offset))
+    return keys
+
+
+def add_sequence_keyframes(image_texture, img_spec):
+    """Animate the frame offset of sequences with steps or missing frames.
+
+    Constant keyframes instead of a scripted driver, they play without
+    Python auto-run.
+    """
+    start, end, step, *missing = img_spec.image['iiap_frame_range']
+    frame_range = FrameRange(
+        img_spec.image.filepath, start, end, step, 0, tuple(zip(missing[::2], missing[1::2])))
+    keys = sequence_offset_keys(frame_range, img_spec.frame_start)
+
+    node_tree = image_texture.id_data
+    data_path = image_texture.image_user.path_from_id('frame_offset')
+    animation_data = node_tree.animation_data or node_tree.animation_data_create()
+    driver = animation_data.drivers.find(data_path)
+    if driver is not None:
+        animation_data.drivers.remove(driver)
+    if animation_data.action is None:
+        animation_data.action = bpy.data.actions.new(img_spec.image.name + '_frames')
+    fcurves = animation_data.action.fcurves
+    fcurve = fcurves.find(data_path)
+    if fcurve is not None:
+        fcurves.remove(fcurve)
+
+    fcurve = fcurves.new(data_path)
+    fcurve.keyframe_points.add(len(keys))
+    fcurve.keyframe_points.foreach_set('co', [value for key in keys for value in key])
+    for point in fcurve.keyframe_points:
+        point.interpolation = 'CONSTANT'
+    fcurve.update()
+
+
+def remove_sequence_keyframes(image_texture):
+    '''drop frame offset keys left from an import of the sequence with gaps'''
+    animation_data = image_texture.id_data.animation_data
+    if animation_data is None or animation_data.action is None:
+        return
+    fcurves = animation_data.action.fcurves
+    fcurve = fcurves.find(image_texture.image_user.path_from_id('frame_offset'))
+    if fcurve is not None:
+        fcurves.remove(fcurve)
+
+
+def blend_method_for(self, img_spec):
+    '''cheapest blend method that still shows the alpha of an image with alpha'''
+    if (self.alpha_analysis == 'NONE'
+            or img_spec.frame_duration != 1
+            or img_spec.image.source in {'SEQUENCE', 'MOVIE', 'TILED'}
+            or getattr(self, 'defer_pixels', False)):  # pixels must not be read
+        return self.graded_blend
+    alpha = classify_alpha(img_spec.image, sampled=self.alpha_analysis == 'SAMPLED')
+    return {'OPAQUE': 'OPAQUE', 'BINARY': 'CLIP'}.get(alpha, self.graded_blend)
+
+
+def material_blend_method(self, img_spec):
+    # Comes from the file header, reading img.depth would decode the image
+    if not img_spec.use_alpha:
+        return 'OPAQUE'
+    return blend_method_for(self, img_spec)
+
+
+def assign_image(self, img_spec, material):
+    '''point the image node of a built material at the image of img_spec'''
+    # unchanged values are not written again, that would recompile the shader
+    image_texture = material.node_tree.nodes[IMAGE_NODE]
+    set_changed(image_texture, 'image', img_spec.image)
+    if material.blend_method != 'OPAQUE':
+        set_changed(img_spec.image, 'alpha_mode', self.alpha_mode)
+
+    if img_spec.image.source == 'SEQUENCE':
+        image_user = image_texture.image_user
+        set_changed(image_user, 'frame_start', img_spec.frame_start)
+        set_changed(image_user, 'frame_offset', img_spec.frame_offset)
+        set_changed(image_user, 'frame_duration', img_spec.frame_duration)
+        set_changed(image_user, 'use_auto_refresh', True)
+    if img_spec.image.source == 'SEQUENCE' and 'iiap_frame_range' in img_spec.image:
+        add_sequence_keyframes(image_texture, img_spec)
+    else:
+        remove_sequence_keyframes(image_texture)
+
+
+def material_template(self, blend_method):
+    '''hidden material with the nodes for these options, built once'''
+    name = '%s%d_%s_%s_%d' % (TEMPLATE_PREFIX, TEMPLATE_VERSION,
+                              self.materialtype, blend_method, self.only_camera)
+    template = self.datablocks.get('materials', name)
+    if template is None:
+        template = bpy.data.materials.new(name)
+        template.use_nodes = True
+        build_material_nodes(self, template, blend_method)
+        self.datablocks.add(template)
+    return template
+
+
+def build_material_nodes(self, material, blend_method):
+    '''image independent part of the material'''
     node_tree = material.node_tree
     nodes = node_tree.nodes
     links = node_tree.links
-    has_alpha = img.depth == 32
+    has_alpha = blend_method != 'OPAQUE'
 
     # Start fresh
     for node in nodes:
@@ -29,15 +147,9 @@ def create_nodes_for_material(self, img_spec, material):
         main_shader = nodes.new(type='ShaderNodeBsdfPrincipled')
 
     image_texture = nodes.new(type='ShaderNodeTexImage')
-    image_texture.image = img
+    image_texture.name = IMAGE_NODE
     image_texture.extension = 'CLIP'
 
-    if img_spec.image.source == 'SEQUENCE':
-        image_texture.image_user.frame_start = img_spec.frame_start
-        image_texture.image_user.frame_offset = img_spec.frame_offset
-        image_texture.image_user.frame_duration = img_spec.frame_duration
-        image_texture.image_user.use_auto_refresh = True
-
     if has_alpha:
         mix = nodes.new(type='ShaderNodeMixShader')
         transparancy = nodes.new(type='ShaderNodeBsdfTransparent')
@@ -53,8 +165,8 @@ def create_nodes_for_material(self, img_spec, material):
     xgap = 365
     ygap = 200
     if has_alpha:
-        material.blend_method = 'BLEND'
-        img.alpha_mode = self.alpha_mode
+        material.blend_method = blend_method
+        material.shadow_method = 'HASHED' if blend_method == 'BLEND' else blend_method
 
         # Locations
         if self.only_camera:
@@ -126,23 +238,76 @@ def create_nodes_for_material(self, img_spec, material):
     return material
 
 
-def create_material_for_img_spec(self, img_spec):
-    # get existing or create material
-    if not self.reuse_existing:
-        material = bpy.data.materials.new(img_spec.image.name)
-    elif not img_spec.image.name in bpy.data.materials.keys():
-        material = bpy.data.materials.new(img_spec.image.name)
-    else:
-        material = bpy.data.materials[img_spec.image.name]
-    material.use_nodes = True
+MaterialBatch = namedtuple('MaterialBatch', ['materials', 'timings'])
+
+
+def create_materials_for_img_specs(self, img_specs):
+    """Materials for all img_specs, each phase in one loop over the images.
+
+    Specs of the same image share its material, specs are dict keys so
+    their size has to be a tuple. Returns a MaterialBatch of
+    {img_spec: material} and {phase: seconds} for the phases 'resolve'
+    (reuse and blend methods), 'templates', 'create' (copies and patches of
+    reused materials), 'assign' and 'paths'.
+    """
+    timings = {}
+    clock = time.perf_counter()
 
-    create_nodes_for_material(self, img_spec, material)
+    def phase_done(phase):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[phase] = now - clock
+        clock = now
+
+    images = {}
+    for img_spec in img_specs:
+        images.setdefault(img_spec.image.name, []).append(img_spec)
+
+    reused = {}
+    blend_methods = {}
+    for name, (img_spec, *_others) in images.items():
+        material = self.datablocks.get('materials', name) if self.reuse_existing else None
+        if material is not None:
+            reused[name] = material
+        blend_methods[name] = material_blend_method(self, img_spec)
+    phase_done('resolve')
+
+    templates = {blend_method: material_template(self, blend_method)
+                 for blend_method in set(blend_methods.values())}
+    phase_done('templates')
+
+    by_image = {}
+    for name, material in reused.items():
+        # existing materials are patched in place, unchanged ones aren't touched
+        patch_material(material, templates[blend_methods[name]])
+        by_image[name] = material
+    for name, blend_method in blend_methods.items():
+        if name in reused:
+            continue
+        material = templates[blend_method].copy()
+        material.name = name
+        self.datablocks.add(material)
+        by_image[name] = material
+    phase_done('create')
+
+    for name, material in by_image.items():
+        assign_image(self, images[name][0], material)
+    phase_done('assign')
 
     if self.relative_path:
-        # can't always find the relative path (between drive letters on windows)
-        try:
-            img_spec.image.filepath = bpy.path.relpath(img_spec.image.filepath)
-        except ValueError:
-            pass
+        for img_spec, *_others in images.values():
+            # can't always find the relative path (between drive letters on windows)
+            try:
+                set_changed(img_spec.image, 'filepath', bpy.path.relpath(img_spec.image.filepath))
+            except ValueError:
+                pass
+    phase_done('paths')
 
-    return material
+    materials = {img_spec: by_image[name]
+                 for name, specs in images.items() for img_spec in specs}
+    return MaterialBatch(materials, timings)
+
+
+def create_material_for_img_spec(self, img_spec):
+    # reuse existing or copy the template for these options
+    return create_materials_for_img_specs(self, [img_spec]).materials[img_spec]
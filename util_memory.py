@@ -0,0 +1,123 @@
+'''keep the decoded pixels of imported images within a memory budget'''
+
+import time
+
+import bpy
+
+MANAGED_KEY = 'iiap_managed'
+
+# image name -> time.monotonic() when it was last seen on a visible object
+_last_viewed = {}
+
+# set by the render handlers where bpy.app.is_job_running is missing (2.80)
+_rendering = False
+
+
+@bpy.app.handlers.persistent
+def render_started(_scene, _depsgraph=None):
+    global _rendering
+    _rendering = True
+
+
+@bpy.app.handlers.persistent
+def render_ended(_scene, _depsgraph=None):
+    global _rendering
+    _rendering = False
+
+
+RENDER_HANDLERS = (
+    ('render_init', render_started),
+    ('render_complete', render_ended),
+    ('render_cancel', render_ended),
+)
+
+
+def is_rendering():
+    '''a render job uses the image buffers'''
+    if hasattr(bpy.app, 'is_job_running'):
+        return bpy.app.is_job_running('RENDER')
+    return _rendering
+
+
+def manage_image(image):
+    '''let the budget watcher free this image's buffers'''
+    image[MANAGED_KEY] = True
+
+
+def image_memory(image):
+    '''estimated bytes of decoded pixels, 0 if nothing is loaded'''
+    if not image.has_data:
+        return 0
+    width, height = image.size
+    return width * height * image.channels * (4 if image.is_float else 1)
+
+
+def can_free(image):
+    # Generated or edited pixels only exist in memory
+    if image.is_dirty:
+        return False
+    return image.source in {'FILE', 'SEQUENCE', 'MOVIE'} or bool(image.packed_file)
+
+
+def visible_images():
+    '''names of images used by materials of objects visible in any window'''
+    names = set()
+    seen_materials = set()
+    for window in bpy.context.window_manager.windows:
+        view_layer = window.view_layer
+        for obj in view_layer.objects:
+            if not obj.visible_get(view_layer=view_layer):
+                continue
+            for slot in obj.material_slots:
+                material = slot.material
+                if material is None or material.name in seen_materials:
+                    continue
+                seen_materials.add(material.name)
+                if material.node_tree is None:
+                    continue
+                for node in material.node_tree.nodes:
+                    if node.type == 'TEX_IMAGE' and node.image is not None:
+                        names.add(node.image.name)
+    return names
+
+
+def enforce_budget(budget):
+    """Free the least recently viewed managed images above budget bytes.
+
+    Images on visible objects are never freed, Blender would load them
+    again right away. Nothing is freed while rendering. Returns the number
+    of bytes freed.
+    """
+    if is_rendering():
+        return 0
+    managed = [(image, image_memory(image)) for image in bpy.data.images if image.get(MANAGED_KEY)]
+    total = sum(size for _image, size in managed)
+    if total <= budget:
+        return 0
+
+    now = time.monotonic()
+    visible = visible_images()
+    loaded = []
+    for image, size in managed:
+        if image.name in visible:
+            _last_viewed[image.name] = now
+        elif size:
+            loaded.append((_last_viewed.get(image.name, 0.0), size, image))
+
+    freed = 0
+    loaded.sort(key=lambda entry: entry[0])
+    for _last_view, size, image in loaded:
+        if total - freed <= budget:
+            break
+        if not can_free(image):
+            continue
+        image.gl_free()
+        image.buffers_free()
+        freed += size
+    return freed
+
+
+def managed_memory():
+    '''(bytes, count) of the loaded managed images'''
+    sizes = [image_memory(image) for image in bpy.data.images if image.get(MANAGED_KEY)]
+    return sum(sizes), sum(1 for size in sizes if size)
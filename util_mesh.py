@@ -1,5 +1,6 @@
 import bpy
 import bmesh
+import numpy as np
 from mathutils import Matrix, Vector
 
 
@@ -9,6 +10,10 @@ BASEVERTS = (
     Vector((0.5, 0.5, 0)),  # top right
     Vector((-0.5, 0.5, 0)))  # top left
 
+SHARED_MESH_PREFIX = 'IAP_plane'
+SHARED_MESH_KEY = 'iiap_shared'  # marks meshes with object level materials
+ASPECT_STEPS = 1000  # aspect ratios closer than 1 / ASPECT_STEPS share a mesh
+
 
 def create_mesh(name):
     '''create new mesh with name'''
@@ -55,3 +60,126 @@ def set_mesh_verticies(mesh, imagesize, origin):
             bm.transform(translation)
 
     bm.to_mesh(mesh)
+
+
+ORIGIN_CORNERS = {'BL': 2, 'BR': 3, 'TR': 0, 'TL': 1}  # base vertex moved to the origin
+
+
+def origin_offset(aspect, origin):
+    '''translation set_mesh_verticies applies for origin'''
+    corner = ORIGIN_CORNERS.get(origin)
+    if corner is None:
+        return Vector((0, 0, 0))
+    return Vector((BASEVERTS[corner].x * aspect, BASEVERTS[corner].y, 0))
+
+
+def set_plane_uvs(mesh, imagesize, origin, rect=(0.0, 0.0, 1.0, 1.0)):
+    '''uvs from the vertex positions of a plane, mapped into rect (u0, v0, u1, v1)'''
+    aspect = imagesize[0] / imagesize[1]
+    offset = origin_offset(aspect, origin)
+    u0, v0, u1, v1 = rect
+    uvs = []
+    for loop in mesh.loops:
+        co = mesh.vertices[loop.vertex_index].co - offset
+        uvs += (u0 + (co.x / aspect + 0.5) * (u1 - u0), v0 + (co.y + 0.5) * (v1 - v0))
+    if not mesh.uv_layers:
+        mesh.uv_layers.new()
+    mesh.uv_layers.active.data.foreach_set('uv', uvs)
+
+
+def create_contour_mesh(name, loops, imagesize, origin):
+    '''create a mesh filling the uv loops of an image outline'''
+    from mathutils.geometry import tessellate_polygon
+
+    aspect = imagesize[0] / imagesize[1]
+    offset = origin_offset(aspect, origin)
+    points = [uv for loop in loops for uv in loop]
+    verts = [Vector(((u - 0.5) * aspect, v - 0.5, 0)) + offset for u, v in points]
+
+    faces = []
+    for a, b, c in tessellate_polygon([[(u, v, 0) for u, v in loop] for loop in loops]):
+        # keep every face pointing up like the quad
+        (ax, ay), (bx, by), (cx, cy) = points[a], points[b], points[c]
+        if (bx - ax) * (cy - ay) - (by - ay) * (cx - ax) < 0:
+            b, c = c, b
+        faces.append((a, b, c))
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, [], faces)
+    mesh.update()
+    set_plane_uvs(mesh, imagesize, origin)
+    return mesh
+
+
+def shared_mesh_key(imagesize, origin):
+    """(quantized aspect, origin) of planes that can share one mesh
+
+    >>> shared_mesh_key((1920, 1080), 'CENTER')
+    (1778, 'CENTER')
+    """
+    return round(imagesize[0] / imagesize[1] * ASPECT_STEPS), origin
+
+
+def shared_mesh_name(key):
+    steps, origin = key
+    return '%s_%.3f_%s' % (SHARED_MESH_PREFIX, steps / ASPECT_STEPS, origin)
+
+
+def create_shared_mesh(key):
+    """create the plane mesh of a shared_mesh_key
+
+    It has one empty material slot, planes using it link their material
+    at object level.
+    """
+    steps, origin = key
+    mesh = create_mesh(shared_mesh_name(key))
+    set_mesh_verticies(mesh, (steps, ASPECT_STEPS), origin)
+    mesh.materials.append(None)
+    mesh[SHARED_MESH_KEY] = True
+    return mesh
+
+
+def link_plane_material(plane, material):
+    '''give plane material, on the object if its mesh is shared'''
+    if plane.data.get(SHARED_MESH_KEY):
+        slot = plane.material_slots[0]
+        slot.link = 'OBJECT'
+        slot.material = material
+    else:
+        plane.data.materials.append(material)
+
+
+def create_merged_mesh(name, sizes, locations, origin, uv_rects, material_indices):
+    """create one mesh with a quad per image size, written in one pass per attribute
+
+    locations are the (x, y) of each quad's origin, uv_rects their
+    (u0, v0, u1, v1) and material_indices their material slot.
+    """
+    count = len(sizes)
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(count, 2)
+    aspects = sizes[:, 0] / sizes[:, 1]
+
+    co = np.repeat(np.array(BASEVERTS, dtype=np.float64)[np.newaxis], count, axis=0)
+    co[:, :, 0] *= aspects[:, np.newaxis]
+    corner = ORIGIN_CORNERS.get(origin)
+    if corner is not None:
+        co += co[:, corner:corner + 1].copy()  # like origin_offset
+    co[:, :, :2] += np.asarray(locations, dtype=np.float64).reshape(count, 1, 2)
+
+    u0, v0, u1, v1 = np.asarray(uv_rects, dtype=np.float64).reshape(count, 4).T
+    uvs = np.stack((u0, v0, u1, v0, u1, v1, u0, v1), axis=1)  # same corner order as BASEVERTS
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(4 * count)
+    mesh.vertices.foreach_set('co', co.ravel())
+    mesh.loops.add(4 * count)
+    mesh.loops.foreach_set('vertex_index', np.arange(4 * count, dtype=np.int32))
+    mesh.polygons.add(count)
+    mesh.polygons.foreach_set('loop_start', np.arange(0, 4 * count, 4, dtype=np.int32))
+    if bpy.app.version < (3, 6, 0):  # later versions derive the totals from loop_start
+        mesh.polygons.foreach_set('loop_total', np.full(count, 4, dtype=np.int32))
+    mesh.polygons.foreach_set('material_index', np.asarray(material_indices, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    mesh.uv_layers.new()
+    mesh.uv_layers.active.data.foreach_set('uv', uvs.ravel())
+    return mesh
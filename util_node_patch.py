@@ -0,0 +1,117 @@
+'''bring existing materials in line with a template, writing only what differs'''
+
+import bpy
+
+# Written settings are only compared, every write recompiles the shader
+MATERIAL_SETTINGS = ('blend_method', 'shadow_method', 'use_backface_culling', 'show_transparent_back')
+VALUE_TYPES = {'BOOLEAN', 'INT', 'FLOAT', 'STRING', 'ENUM', 'POINTER'}
+SKIPPED_SETTINGS = {'image'}  # set per material by assign_image
+
+_base_settings = None
+
+
+def set_changed(owner, attribute, value):
+    '''set owner.attribute unless it already is value, True if it was written'''
+    if getattr(owner, attribute) == value:
+        return False
+    setattr(owner, attribute, value)
+    return True
+
+
+def comparable(value):
+    '''tuple of array values, anything else as is'''
+    if hasattr(value, '__len__') and not isinstance(value, (str, set, bpy.types.ID)):
+        return tuple(value)
+    return value
+
+
+def node_settings(node):
+    '''{identifier: value} of the settings a node type adds to bpy.types.Node'''
+    global _base_settings
+    if _base_settings is None:
+        _base_settings = {prop.identifier for prop in bpy.types.Node.bl_rna.properties} - {'mute'}
+    return {prop.identifier: comparable(getattr(node, prop.identifier))
+            for prop in node.bl_rna.properties
+            if prop.type in VALUE_TYPES
+            and not prop.is_readonly
+            and prop.identifier not in _base_settings
+            and prop.identifier not in SKIPPED_SETTINGS}
+
+
+def socket_values(node):
+    '''{input identifier: default value} of the unlinkable part of the inputs'''
+    return {socket.identifier: comparable(socket.default_value)
+            for socket in node.inputs if hasattr(socket, 'default_value')}
+
+
+def link_keys(node_tree):
+    '''{(from node, output, to node, input): link} by names and identifiers'''
+    return {(link.from_node.name, link.from_socket.identifier,
+             link.to_node.name, link.to_socket.identifier): link
+            for link in node_tree.links}
+
+
+def socket_by_identifier(sockets, identifier):
+    return next(socket for socket in sockets if socket.identifier == identifier)
+
+
+def patch_node_tree(node_tree, template_tree):
+    """Make node_tree match template_tree node by node name.
+
+    Nodes of another type are replaced, missing ones are created where
+    the template has them and extra ones removed. Settings, input values
+    and links are only written where they differ. Returns the number of
+    changes, 0 means node_tree was left untouched.
+    """
+    nodes = node_tree.nodes
+    template_nodes = {node.name: node for node in template_tree.nodes}
+    changes = 0
+
+    for node in list(nodes):
+        source = template_nodes.get(node.name)
+        if source is None or node.bl_idname != source.bl_idname:
+            nodes.remove(node)
+            changes += 1
+
+    for name, source in template_nodes.items():
+        node = nodes.get(name)
+        if node is None:
+            node = nodes.new(source.bl_idname)
+            node.name = name
+            node.location = source.location
+            node.width = source.width
+            node.label = source.label
+            changes += 1
+        # settings first, they can change the inputs (group nodes)
+        current = node_settings(node)
+        for identifier, value in node_settings(source).items():
+            if current.get(identifier) != value:
+                setattr(node, identifier, value)
+                changes += 1
+        current = socket_values(node)
+        for identifier, value in socket_values(source).items():
+            if current.get(identifier) != value:
+                socket_by_identifier(node.inputs, identifier).default_value = value
+                changes += 1
+
+    current = link_keys(node_tree)
+    target = link_keys(template_tree)
+    for key, link in current.items():
+        if key not in target:
+            node_tree.links.remove(link)
+            changes += 1
+    for from_name, from_socket, to_name, to_socket in target.keys() - current.keys():
+        node_tree.links.new(socket_by_identifier(nodes[to_name].inputs, to_socket),
+                            socket_by_identifier(nodes[from_name].outputs, from_socket))
+        changes += 1
+
+    return changes
+
+
+def patch_material(material, template):
+    '''patch_node_tree for materials, with their blend settings'''
+    changes = int(set_changed(material, 'use_nodes', True))
+    for setting in MATERIAL_SETTINGS:
+        if hasattr(template, setting):
+            changes += set_changed(material, setting, getattr(template, setting))
+    return changes + patch_node_tree(material.node_tree, template.node_tree)
@@ -0,0 +1,178 @@
+'''persistent cache for image probe results and sequence groupings'''
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import bpy
+
+from .util_probe_images import ImageHeader
+
+CACHE_VERSION = 4  # bump when the stored data changes meaning
+MAX_ENTRIES = 100000
+
+_cache = None
+
+
+def addon_cache_dir():
+    '''directory for files the add-on keeps between sessions'''
+    return bpy.utils.user_resource(
+        'CONFIG', path='io_import_images_as_planes', create=True)
+
+
+class ProbeCache:
+    """SQLite backed cache of FileProbe headers and detected sequences.
+
+    Headers are keyed by absolute path and only valid while mtime and
+    file size match. Lookups are safe from the probe worker threads.
+    Access times are batched and written by flush(), which also evicts
+    the least recently used entries above max_entries.
+    """
+
+    def __init__(self, filepath, max_entries=MAX_ENTRIES):
+        self.filepath = filepath
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._connection = sqlite3.connect(filepath, check_same_thread=False)
+        self._setup()
+
+    def _setup(self):
+        db = self._connection
+        version = db.execute('PRAGMA user_version').fetchone()[0]
+        if version != CACHE_VERSION:
+            db.execute('DROP TABLE IF EXISTS headers')
+            db.execute('DROP TABLE IF EXISTS sequences')
+        db.execute('''CREATE TABLE IF NOT EXISTS headers (
+            path TEXT PRIMARY KEY, mtime INTEGER, file_size INTEGER,
+            width INTEGER, height INTEGER, channels INTEGER,
+            bit_depth INTEGER, has_alpha INTEGER, frame_count INTEGER, fps REAL,
+            digest TEXT, last_used REAL)''')
+        db.execute('''CREATE TABLE IF NOT EXISTS sequences (
+            key TEXT PRIMARY KEY, result TEXT, last_used REAL)''')
+        db.execute('PRAGMA user_version = %d' % CACHE_VERSION)
+        db.commit()
+
+    # Headers
+    def get_header(self, filepath, mtime, file_size):
+        """Return (hit, header). header is None for files of unknown format."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT mtime, file_size, width, height, channels, bit_depth, has_alpha, '
+                'frame_count, fps FROM headers WHERE path = ?', (filepath,)).fetchone()
+            if row is None or row[0] != mtime or row[1] != file_size:
+                return False, None
+            self._touched[('headers', filepath)] = time.time()
+
+        width, height, channels, bit_depth, has_alpha, frame_count, fps = row[2:]
+        if width is None:
+            return True, None
+        return True, ImageHeader(
+            (width, height), channels, bit_depth, bool(has_alpha), frame_count, fps)
+
+    def put_header(self, filepath, mtime, file_size, header):
+        if header is None:
+            values = (None,) * 7
+        else:
+            values = (*header.size, header.channels, header.bit_depth, int(header.has_alpha),
+                      header.frame_count, header.fps)
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO headers (path, mtime, file_size, width, height, '
+                'channels, bit_depth, has_alpha, frame_count, fps, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (filepath, mtime, file_size, *values, time.time()))
+
+    def get_digest(self, filepath, mtime, file_size):
+        '''content hash stored for this version of the file or None'''
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT digest FROM headers WHERE path = ? AND mtime = ? AND file_size = ?',
+                (filepath, mtime, file_size)).fetchone()
+        return row[0] if row else None
+
+    def put_digest(self, filepath, mtime, file_size, digest):
+        # The header row is written by the probe before hashing
+        with self._lock:
+            self._connection.execute(
+                'UPDATE headers SET digest = ? WHERE path = ? AND mtime = ? AND file_size = ?',
+                (digest, filepath, mtime, file_size))
+
+    # Sequences
+    @staticmethod
+    def _sequence_key(filenames, max_gap):
+        # The grouping only depends on the names and the gap, not on where they are
+        text = '%d\n%s' % (max_gap, '\n'.join(filenames))
+        return hashlib.sha1(text.encode('utf-8', 'surrogateescape')).hexdigest()
+
+    def get_sequences(self, filenames, max_gap):
+        '''return the stored sequences as plain lists or None'''
+        key = self._sequence_key(filenames, max_gap)
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT result FROM sequences WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched[('sequences', key)] = time.time()
+        return json.loads(row[0])
+
+    def put_sequences(self, filenames, max_gap, sequences):
+        key = self._sequence_key(filenames, max_gap)
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO sequences VALUES (?, ?, ?)',
+                (key, json.dumps(sequences), time.time()))
+
+    # Maintenance
+    def flush(self):
+        '''write access times, evict old entries and commit'''
+        with self._lock:
+            db = self._connection
+            for (table, key), last_used in self._touched.items():
+                column = 'path' if table == 'headers' else 'key'
+                db.execute('UPDATE %s SET last_used = ? WHERE %s = ?' % (table, column),
+                           (last_used, key))
+            self._touched.clear()
+
+            for table in ('headers', 'sequences'):
+                count = db.execute('SELECT COUNT(*) FROM %s' % table).fetchone()[0]
+                if count > self.max_entries:
+                    db.execute(
+                        'DELETE FROM {0} WHERE rowid IN (SELECT rowid FROM {0} '
+                        'ORDER BY last_used LIMIT ?)'.format(table),
+                        (count - self.max_entries,))
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._connection.execute('DELETE FROM headers')
+            self._connection.execute('DELETE FROM sequences')
+            self._connection.commit()
+            self._connection.execute('VACUUM')
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+def get_cache():
+    """Return the shared ProbeCache, or None if it can't be opened."""
+    global _cache
+    if _cache is None:
+        try:
+            _cache = ProbeCache(os.path.join(addon_cache_dir(), 'probe_cache.sqlite'))
+        except (OSError, sqlite3.Error) as err:
+            print('Image probe cache unavailable:', err)
+            return None
+    return _cache
+
+
+def close_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
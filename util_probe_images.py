@@ -0,0 +1,631 @@
+'''read image dimensions and alpha from file headers without decoding pixels'''
+
+import hashlib
+import os
+import struct
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# -----------------------------------------------------------------------------
+# Image headers
+
+ImageHeader = namedtuple(
+    'ImageHeader',
+    ['size', 'channels', 'bit_depth', 'has_alpha', 'frame_count', 'fps'],
+    defaults=(None, None))  # only set for movies
+
+HEAD_SIZE = 32  # enough bytes to tell every supported format apart
+
+
+def _unpack(fmt, data, offset=0):
+    '''struct.unpack_from that reports truncated data as None'''
+    try:
+        return struct.unpack_from(fmt, data, offset)
+    except struct.error:
+        return None
+
+
+def read_png(f, head):
+    '''PNG: IHDR holds size and color type, a tRNS chunk adds alpha'''
+    values = _unpack('>II2B', head, 16)
+    if head[12:16] != b'IHDR' or values is None:
+        return None
+    width, height, bit_depth, color_type = values
+    channels, has_alpha = {
+        0: (1, False),  # grayscale
+        2: (3, False),  # rgb
+        3: (3, False),  # palette
+        4: (2, True),  # grayscale + alpha
+        6: (4, True),  # rgba
+    }.get(color_type, (None, None))
+    if channels is None:
+        return None
+    if color_type == 3:
+        bit_depth = 8
+
+    # A tRNS chunk can only appear between IHDR and the first IDAT
+    f.seek(8 + 8 + 13 + 4)
+    while not has_alpha:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', chunk)
+        if chunk_type in (b'IDAT', b'IEND'):
+            break
+        if chunk_type == b'tRNS':
+            has_alpha = True
+            channels += 1
+            break
+        f.seek(length + 4, os.SEEK_CUR)  # skip data and crc
+
+    return ImageHeader((width, height), channels, bit_depth, has_alpha)
+
+
+# Start-of-frame markers, excluding DHT (C4), JPG (C8) and DAC (CC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def read_jpeg(f, head):
+    '''JPEG: walk the marker segments up to the first start-of-frame'''
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            continue  # standalone markers without a length
+        if marker in (0xD9, 0xDA):
+            return None  # end of image / start of scan before any frame
+        data = f.read(2)
+        if len(data) < 2:
+            return None
+        length = struct.unpack('>H', data)[0]
+        if marker in JPEG_SOF_MARKERS:
+            values = _unpack('>BHHB', f.read(6))
+            if values is None:
+                return None
+            precision, height, width, channels = values
+            return ImageHeader((width, height), channels, precision, False)
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+TIFF_TYPE_SIZES = {1: 1, 3: 2, 4: 4}  # BYTE, SHORT, LONG
+
+
+def read_tiff(f, head):
+    '''TIFF: read the tags of the first image file directory'''
+    endian = '<' if head[:2] == b'II' else '>'
+    ifd_offset = _unpack(endian + 'I', head, 4)
+    if ifd_offset is None:
+        return None
+    f.seek(ifd_offset[0])
+    data = f.read(2)
+    if len(data) < 2:
+        return None
+    entry_count = struct.unpack(endian + 'H', data)[0]
+    entries = f.read(entry_count * 12)
+
+    tags = {}
+    for i in range(len(entries) // 12):
+        tag, value_type, count = struct.unpack_from(endian + 'HHI', entries, i * 12)
+        size = TIFF_TYPE_SIZES.get(value_type)
+        if size is None or count == 0:
+            continue
+        char = {1: 'B', 2: 'H', 4: 'I'}[size]
+        if size * count <= 4:
+            value = struct.unpack_from(endian + char, entries, i * 12 + 8)[0]
+        else:
+            # Only the first value of out of line arrays is needed
+            offset = struct.unpack_from(endian + 'I', entries, i * 12 + 8)[0]
+            position = f.tell()
+            f.seek(offset)
+            value = _unpack(endian + char, f.read(size))
+            f.seek(position)
+            if value is None:
+                continue
+            value = value[0]
+        tags[tag] = (value, count)
+
+    if 256 not in tags or 257 not in tags:
+        return None
+    width = tags[256][0]
+    height = tags[257][0]
+    bit_depth = tags.get(258, (1, 1))[0]
+    channels = tags.get(277, (1, 1))[0]
+    has_alpha = 338 in tags or channels in (2, 4)
+    return ImageHeader((width, height), channels, bit_depth, has_alpha)
+
+
+EXR_PIXEL_BITS = {0: 32, 1: 16, 2: 32}  # UINT, HALF, FLOAT
+
+
+def _read_cstring(f, limit=256):
+    chars = bytearray()
+    while len(chars) < limit:
+        char = f.read(1)
+        if not char or char == b'\0':
+            return bytes(chars)
+        chars += char
+    return None
+
+
+def read_exr(f, head):
+    '''OpenEXR: parse header attributes for channels and data window'''
+    f.seek(8)
+    channel_names = []
+    bit_depth = 16
+    size = None
+    while True:
+        name = _read_cstring(f)
+        if not name:  # empty name terminates the header
+            break
+        attr_type = _read_cstring(f)
+        data = f.read(4)
+        if attr_type is None or len(data) < 4:
+            return None
+        attr_size = struct.unpack('<i', data)[0]
+        value = f.read(attr_size)
+        if len(value) < attr_size:
+            return None
+
+        if name == b'channels' and attr_type == b'chlist':
+            offset = 0
+            while offset < len(value) and value[offset] != 0:
+                end = value.index(b'\0', offset)
+                channel_names.append(value[offset:end].decode('latin-1'))
+                pixel_type = struct.unpack_from('<i', value, end + 1)[0]
+                bit_depth = max(bit_depth, EXR_PIXEL_BITS.get(pixel_type, 16))
+                offset = end + 1 + 16  # pixel type, linear, reserved, sampling
+        elif name == b'dataWindow' and attr_type == b'box2i':
+            x_min, y_min, x_max, y_max = struct.unpack('<4i', value)
+            size = (x_max - x_min + 1, y_max - y_min + 1)
+
+    if size is None or not channel_names:
+        return None
+    has_alpha = any(name.rsplit('.', 1)[-1] == 'A' for name in channel_names)
+    return ImageHeader(size, len(channel_names), bit_depth, has_alpha)
+
+
+def read_webp(f, head):
+    '''WebP: the first chunk is either lossy, lossless or extended'''
+    chunk = head[12:16]
+    if chunk == b'VP8X':
+        flags = head[20]
+        width = int.from_bytes(head[24:27], 'little') + 1
+        height = int.from_bytes(head[27:30], 'little') + 1
+        has_alpha = bool(flags & 0x10)
+    elif chunk == b'VP8L':
+        if head[20] != 0x2f:
+            return None
+        bits = int.from_bytes(head[21:25], 'little')
+        width = (bits & 0x3fff) + 1
+        height = ((bits >> 14) & 0x3fff) + 1
+        has_alpha = bool((bits >> 28) & 1)
+    elif chunk == b'VP8 ':
+        if head[23:26] != b'\x9d\x01\x2a':
+            return None
+        width, height = struct.unpack_from('<HH', head, 26)
+        width &= 0x3fff
+        height &= 0x3fff
+        has_alpha = False
+    else:
+        return None
+    return ImageHeader((width, height), 4 if has_alpha else 3, 8, has_alpha)
+
+
+def read_bmp(f, head):
+    '''BMP: the DIB header follows the 14 byte file header'''
+    header_size = _unpack('<I', head, 14)
+    if header_size is None:
+        return None
+    if header_size[0] == 12:  # OS/2 BITMAPCOREHEADER
+        values = _unpack('<4H', head, 18)
+    else:
+        values = _unpack('<iiHH', head, 18)
+    if values is None:
+        return None
+    width, height, _planes, bits = values
+    has_alpha = bits == 32
+    channels = 4 if has_alpha else 3
+    return ImageHeader((width, abs(height)), channels, 8, has_alpha)
+
+
+TGA_EXTENSIONS = ('.tga', '.targa')
+
+
+def read_tga(f, head):
+    '''Targa has no magic number, so validate the fixed 18 byte header'''
+    values = _unpack('<3B5x4H2B', head)
+    if values is None:
+        return None
+    _id_length, color_map_type, image_type, _x, _y, width, height, depth, descriptor = values
+    if (color_map_type > 1 or image_type not in (1, 2, 3, 9, 10, 11)
+            or depth not in (8, 15, 16, 24, 32) or not width or not height):
+        return None
+    alpha_bits = descriptor & 0x0f
+    has_alpha = alpha_bits > 0 or depth == 32
+    if image_type in (3, 11):  # grayscale
+        channels = 2 if has_alpha else 1
+    else:
+        channels = 4 if has_alpha else 3
+    return ImageHeader((width, height), channels, 8, has_alpha)
+
+
+# -----------------------------------------------------------------------------
+# Movie containers
+#
+# Only the container headers are read: frame count, frame rate and size of
+# the first video track, without FFmpeg ever opening the file.
+
+def movie_header(size, frame_count, fps):
+    if not size or not frame_count:
+        return None
+    return ImageHeader(size, 3, 8, False, frame_count, fps)
+
+
+MP4_TOP_LEVEL = {b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+
+
+def _mp4_boxes(f, start, end):
+    '''yield (type, data start, data end) of the boxes between start and end'''
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        values = _unpack('>I4s', f.read(8))
+        if values is None:
+            return
+        size, box_type = values
+        header_size = 8
+        if size == 1:  # 64 bit size follows
+            large = _unpack('>Q', f.read(8))
+            if large is None:
+                return
+            size, header_size = large[0], 16
+        elif size == 0:  # up to the end of the file
+            size = end - position
+        if size < header_size:
+            return
+        yield box_type, position + header_size, min(position + size, end)
+        position += size
+
+
+def read_mp4(f, head):
+    '''MP4 / QuickTime: walk the atoms down to the video track's sample table'''
+    f.seek(0, os.SEEK_END)
+    file_end = f.tell()
+
+    def tracks(start, end):
+        for box_type, data_start, data_end in _mp4_boxes(f, start, end):
+            if box_type == b'moov':
+                yield from tracks(data_start, data_end)
+            elif box_type == b'trak':
+                yield data_start, data_end
+
+    def find(start, end, path):
+        for box_type, data_start, data_end in _mp4_boxes(f, start, end):
+            if box_type == path[0]:
+                if len(path) == 1:
+                    f.seek(data_start)
+                    return f.read(min(data_end - data_start, 1 << 20))
+                return find(data_start, data_end, path[1:])
+        return None
+
+    for start, end in tracks(0, file_end):
+        handler = find(start, end, [b'mdia', b'hdlr'])
+        if handler is None or handler[8:12] != b'vide':
+            continue
+        mdhd = find(start, end, [b'mdia', b'mdhd'])
+        stts = find(start, end, [b'mdia', b'minf', b'stbl', b'stts'])
+        stsd = find(start, end, [b'mdia', b'minf', b'stbl', b'stsd'])
+        if not mdhd or not stts or not stsd:
+            return None
+
+        if mdhd[0] == 1:  # version 1 has 64 bit times
+            timescale, duration = struct.unpack_from('>IQ', mdhd, 20)
+        else:
+            timescale, duration = struct.unpack_from('>II', mdhd, 12)
+        entry_count = struct.unpack_from('>I', stts, 4)[0]
+        entries = [struct.unpack_from('>II', stts, 8 + 8 * i)
+                   for i in range(min(entry_count, (len(stts) - 8) // 8))]
+        frame_count = sum(count for count, delta in entries)
+        fps = frame_count * timescale / duration if duration else None
+        # The first visual sample entry stores the coded size
+        size = struct.unpack_from('>HH', stsd, 8 + 8 + 8 + 16)
+        return movie_header(size, frame_count, fps)
+    return None
+
+
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TRACKS = 0x1654AE6B
+MKV_CLUSTER = 0x1F43B675
+MKV_TRACK_ENTRY = 0xAE
+
+
+def _ebml_vint(f, keep_marker):
+    first = f.read(1)
+    if not first:
+        return None, 0
+    first = first[0]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        return None, 0
+    value = first if keep_marker else first & (0xFF >> length)
+    rest = f.read(length - 1)
+    if len(rest) < length - 1:
+        return None, 0
+    for byte in rest:
+        value = value << 8 | byte
+    all_ones = not keep_marker and value == (1 << (7 * length)) - 1
+    return (None if all_ones else value), length
+
+
+def _ebml_elements(f, start, end):
+    '''yield (id, data start, data end), unknown sizes run to end'''
+    position = start
+    while position < end:
+        f.seek(position)
+        element_id, id_length = _ebml_vint(f, keep_marker=True)
+        if element_id is None:
+            return
+        size, size_length = _ebml_vint(f, keep_marker=False)
+        if not size_length:
+            return
+        data_start = position + id_length + size_length
+        data_end = end if size is None else min(data_start + size, end)
+        yield element_id, data_start, data_end
+        position = data_end
+
+
+def _ebml_values(f, start, end):
+    values = {}
+    for element_id, data_start, data_end in _ebml_elements(f, start, end):
+        f.seek(data_start)
+        values[element_id] = (data_start, data_end, f.read(min(data_end - data_start, 8)))
+    return values
+
+
+def _ebml_uint(data):
+    return int.from_bytes(data, 'big')
+
+
+def _ebml_float(data):
+    return struct.unpack('>f' if len(data) == 4 else '>d', data)[0]
+
+
+def read_matroska(f, head):
+    '''Matroska / WebM: segment info and the first video track entry'''
+    f.seek(0, os.SEEK_END)
+    file_end = f.tell()
+    segment = next((element for element in _ebml_elements(f, 0, file_end)
+                    if element[0] == MKV_SEGMENT), None)
+    if segment is None:
+        return None
+
+    duration = size = frame_time = None
+    timecode_scale = 1000000
+    for element_id, start, end in _ebml_elements(f, segment[1], segment[2]):
+        if element_id == MKV_INFO:
+            info = _ebml_values(f, start, end)
+            if 0x2AD7B1 in info:
+                timecode_scale = _ebml_uint(info[0x2AD7B1][2])
+            if 0x4489 in info:
+                duration = _ebml_float(info[0x4489][2])
+        elif element_id == MKV_TRACKS:
+            for entry_id, entry_start, entry_end in _ebml_elements(f, start, end):
+                if entry_id != MKV_TRACK_ENTRY:
+                    continue
+                track = _ebml_values(f, entry_start, entry_end)
+                if 0x83 not in track or _ebml_uint(track[0x83][2]) != 1:  # video
+                    continue
+                if 0x23E383 in track:
+                    frame_time = _ebml_uint(track[0x23E383][2])
+                if 0xE0 in track:
+                    video = _ebml_values(f, track[0xE0][0], track[0xE0][1])
+                    if 0xB0 in video and 0xBA in video:
+                        size = (_ebml_uint(video[0xB0][2]), _ebml_uint(video[0xBA][2]))
+                break
+        elif element_id == MKV_CLUSTER:
+            break  # headers come before the media data
+        if duration is not None and size is not None:
+            break
+
+    if duration is None or not frame_time:
+        return None
+    fps = 1e9 / frame_time
+    return movie_header(size, round(duration * timecode_scale / frame_time), fps)
+
+
+def read_avi(f, head):
+    '''AVI: the stream header of the first video stream in the hdrl list'''
+    f.seek(12)
+    data = f.read(12)
+    if len(data) < 12 or data[:4] != b'LIST' or data[8:12] != b'hdrl':
+        return None
+    hdrl_size = struct.unpack_from('<I', data, 4)[0]
+    hdrl = f.read(min(hdrl_size - 4, 1 << 16))
+
+    size = None
+    position = 0
+    while position + 8 <= len(hdrl):
+        chunk, chunk_size = struct.unpack_from('<4sI', hdrl, position)
+        body = hdrl[position + 8:position + 8 + chunk_size]
+        if chunk == b'avih' and len(body) >= 40:
+            size = struct.unpack_from('<II', body, 32)
+        elif chunk == b'LIST' and body[:4] == b'strl':
+            strh = body[4:]
+            if strh[:4] == b'strh' and strh[8:12] == b'vids' and len(strh) >= 8 + 36:
+                scale, rate, _start, length = struct.unpack_from('<4I', strh, 8 + 20)
+                fps = rate / scale if scale else None
+                return movie_header(size, length, fps)
+        position += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _header_reader(head, filepath):
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return read_png
+    if head.startswith(b'\xff\xd8'):
+        return read_jpeg
+    if head.startswith((b'II*\0', b'MM\0*')):
+        return read_tiff
+    if head.startswith(b'\x76\x2f\x31\x01'):
+        return read_exr
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return read_webp
+    if head.startswith(b'RIFF') and head[8:12] == b'AVI ':
+        return read_avi
+    if head[4:8] in MP4_TOP_LEVEL:
+        return read_mp4
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return read_matroska
+    if head.startswith(b'BM'):
+        return read_bmp
+    if filepath.lower().endswith(TGA_EXTENSIONS):
+        return read_tga
+    return None
+
+
+def probe_image(filepath):
+    """Return an ImageHeader for filepath or None if it can't be determined.
+
+    Only the header is read, so this is cheap even for very large images
+    and safe to call from any thread.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(HEAD_SIZE)
+            reader = _header_reader(head, filepath)
+            if reader is None:
+                return None
+            header = reader(f, head)
+    except (OSError, struct.error, ValueError, IndexError):
+        return None
+
+    if header is None or 0 in header.size:
+        return None
+    return header
+
+
+# -----------------------------------------------------------------------------
+# Probing files
+
+FileProbe = namedtuple(
+    'FileProbe',
+    ['filename', 'filepath', 'exists', 'file_size', 'mtime', 'header'])
+
+MAX_PROBE_WORKERS = 16  # probing is I/O bound, more threads only add contention
+
+
+def probe_file(filename, directory, cache=None):
+    """Stat and probe a single file. Never touches bpy.
+
+    With a cache (see util_probe_cache.ProbeCache) the header is only read
+    if the file changed since it was last probed.
+    """
+    filepath = os.path.join(directory, filename)
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return FileProbe(filename, filepath, False, 0, 0, None)
+
+    if cache is None:
+        header = probe_image(filepath)
+    else:
+        key = (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+        hit, header = cache.get_header(*key)
+        if not hit:
+            header = probe_image(filepath)
+            cache.put_header(*key, header)
+
+    return FileProbe(filename, filepath, True, stat.st_size, stat.st_mtime_ns, header)
+
+
+def probe_files(filenames, directory, max_workers=MAX_PROBE_WORKERS, cache=None):
+    """Probe many files in a bounded thread pool.
+
+    File system calls release the GIL, so on slow or networked storage the
+    latency of many files overlaps. Returns a list of FileProbe in the
+    order of filenames.
+    """
+    filenames = list(filenames)
+    probe = partial(probe_file, directory=directory, cache=cache)
+    if len(filenames) < 2 or max_workers < 2:
+        return list(map(probe, filenames))
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(filenames))) as executor:
+        return list(executor.map(probe, filenames))
+
+
+# -----------------------------------------------------------------------------
+# Content hashes
+
+HASH_CHUNK_SIZE = 1 << 20  # hashlib releases the GIL for large updates
+
+
+def hash_file(filepath):
+    '''hex digest of the file contents, read in chunks'''
+    digest = hashlib.blake2b(digest_size=20)
+    with open(filepath, 'rb') as f:
+        for chunk in iter(partial(f.read, HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_digest(probe, cache=None):
+    '''hash of a probed file, None if it can't be read'''
+    key = (os.path.abspath(probe.filepath), probe.mtime, probe.file_size)
+    digest = cache.get_digest(*key) if cache is not None else None
+    if digest is None:
+        try:
+            digest = hash_file(probe.filepath)
+        except OSError:
+            return None
+        if cache is not None:
+            cache.put_digest(*key, digest)
+    return digest
+
+
+def find_duplicates(probes, max_workers=MAX_PROBE_WORKERS, cache=None):
+    """Find files with identical contents.
+
+    Only files sharing their size with another file are hashed, in a
+    bounded thread pool. Returns a dict of duplicate file path -> file
+    path of the first identical file in probes, and the bytes saved by
+    loading each content only once. Paths tell apart files of the same
+    name from different directories.
+    """
+    by_size = {}
+    for probe in probes:
+        if probe.exists and probe.file_size:
+            by_size.setdefault(probe.file_size, []).append(probe)
+    candidates = [probe for group in by_size.values() if len(group) > 1 for probe in group]
+    if not candidates:
+        return {}, 0
+
+    digest = partial(content_digest, cache=cache)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(candidates))) as executor:
+        digests = list(executor.map(digest, candidates))
+
+    originals = {}
+    duplicates = {}
+    saved = 0
+    for probe, digest in zip(candidates, digests):
+        if digest is None:
+            continue
+        original = originals.setdefault(digest, probe.filepath)
+        if original != probe.filepath:
+            duplicates[probe.filepath] = original
+            saved += probe.file_size
+    return duplicates, saved
@@ -0,0 +1,75 @@
+'''walk directory trees for images without listing the whole tree up front'''
+
+import os
+from fnmatch import fnmatchcase
+
+
+def split_patterns(text):
+    """Split a user entered pattern list on ';' or ','.
+
+    >>> split_patterns('*.png; beauty_*,,')
+    ['*.png', 'beauty_*']
+    """
+    return [pattern.strip().lower() for pattern in text.replace(',', ';').split(';')
+            if pattern.strip()]
+
+
+def matches_any(name, relative_path, patterns):
+    '''glob match against the name or the path relative to the scan root'''
+    name = name.lower()
+    relative_path = relative_path.lower()
+    return any(fnmatchcase(name, pattern) or fnmatchcase(relative_path, pattern)
+               for pattern in patterns)
+
+
+def scan_directory(directory, extensions=None, include=(), exclude=(), max_depth=0):
+    """Walk directory with os.scandir and yield (subdirectory, file names).
+
+    Every directory is one batch: sequences never span directories, so each
+    batch can go through sequence detection and load_images on its own while
+    the rest of the tree is not listed yet. subdirectory is relative to
+    directory, '' for directory itself.
+
+    extensions is a set of lower case extensions ('.png') or None for all.
+    include and exclude are lower case glob patterns (see split_patterns)
+    matched against names and relative paths. Excluded directories are not
+    entered, include only applies to files. max_depth limits how many levels
+    of subdirectories are scanned, 0 scans directory only, -1 has no limit.
+    Hidden entries and symlinked directories are skipped.
+    """
+    pending = [('', 0)]
+    while pending:
+        subdirectory, depth = pending.pop()
+        try:
+            with os.scandir(os.path.join(directory, subdirectory)) as entries:
+                entries = [entry for entry in entries if not entry.name.startswith('.')]
+        except OSError:
+            continue
+
+        filenames = []
+        subdirectories = []
+        for entry in entries:
+            relative_path = os.path.join(subdirectory, entry.name).replace(os.sep, '/')
+            if exclude and matches_any(entry.name, relative_path, exclude):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if max_depth < 0 or depth < max_depth:
+                        subdirectories.append(os.path.join(subdirectory, entry.name))
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if extensions is not None and os.path.splitext(entry.name)[1].lower() not in extensions:
+                continue
+            if include and not matches_any(entry.name, relative_path, include):
+                continue
+            filenames.append(entry.name)
+
+        if filenames:
+            filenames.sort()
+            yield subdirectory, filenames
+
+        # Depth first, in name order
+        pending.extend((path, depth + 1) for path in sorted(subdirectories, reverse=True))
@@ -0,0 +1,289 @@
+'''detect numbered image sequences in lists of file names'''
+
+import re
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from itertools import accumulate
+from math import gcd, inf
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Sequence detection
+#
+# Each file name is split once into a pattern key, the name with every digit
+# replaced, and its digits. Names sharing a key have digits of the same width
+# at the same positions, so the digits of a name read as one integer encode
+# every numeric field: digits "0012" + "0100" are fields (12, 100) and 120100
+# as a whole. The split works on all names joined into one UTF-8 buffer, the
+# values of a group are computed and sorted by numpy, and names are written
+# back from the key and value for the results. Runs are found with integer
+# arithmetic on the values, mostly by bisecting for the end of a run.
+
+DIGIT = '\x01'  # placeholder for digits, not valid in file names on Windows
+DIGITS_TO_PLACEHOLDER = bytes.maketrans(b'0123456789', DIGIT.encode() * 10)
+NOT_DIGITS = bytes(set(range(256)).difference(b'0123456789\0'))
+placeholder_regex = re.compile(DIGIT + '+')
+MAX_GAP = 4  # largest frame jump inside a sequence, camera numbering is often sparse
+MAX_INT64_DIGITS = 18  # wider values are sorted as Python integers
+
+
+class FrameRange(namedtuple(
+        'FrameRange', ['filename', 'start', 'end', 'step', 'padding', 'missing'])):
+    """Frames of an image sequence, or a single image.
+
+    missing holds (first, last) pairs of frames on the step grid without a
+    file, so even long sequences with many dropped frames stay small.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def single(cls, filename):
+        return cls(filename, 1, 1, 1, 0, ())
+
+    @classmethod
+    def from_frames(cls, filename, frames, padding):
+        '''build from the sorted frame numbers of all existing files'''
+        if isinstance(frames, range):
+            return cls(filename, frames.start, frames[-1], frames.step, padding, ())
+
+        step = 0
+        for previous, frame in zip(frames, frames[1:]):
+            step = gcd(step, frame - previous)
+        missing = tuple((previous + step, frame - step)
+                        for previous, frame in zip(frames, frames[1:])
+                        if frame - previous > step)
+        return cls(filename, frames[0], frames[-1], step, padding, missing)
+
+    @property
+    def duration(self):
+        '''number of frames from start to end, including missing ones'''
+        return self.end - self.start + 1
+
+    @property
+    def is_sequence(self):
+        return self.end > self.start
+
+    def held_frame(self, frame):
+        """Return the existing frame to show at frame.
+
+        Frames between steps and missing frames hold the previous frame.
+
+        >>> sequence = FrameRange('r.01.exr', 1, 11, 2, 2, ((5, 7),))
+        >>> [sequence.held_frame(frame) for frame in range(0, 13)]
+        [1, 1, 1, 3, 3, 3, 3, 3, 3, 9, 9, 11, 11]
+        """
+        frame = min(max(frame, self.start), self.end)
+        frame -= (frame - self.start) % self.step
+        index = bisect_right(self.missing, (frame, inf)) - 1
+        if index >= 0 and self.missing[index][0] <= frame <= self.missing[index][1]:
+            frame = self.missing[index][0] - self.step
+        return frame
+
+
+def split_names(files):
+    """Return the pattern keys and the digits of every name in files as bytes.
+
+    Digits only occur as single bytes in UTF-8, so both are split out of
+    one encoded buffer of all names.
+
+    >>> split_names(['a1_02.png', 'b.png'])
+    ([b'a\\x01_\\x01\\x01.png', b'b.png'], [b'102', b''])
+    """
+    if not files:
+        return [], []
+    # surrogatepass keeps names listed with surrogateescape round tripping
+    names = '\0'.join(files).encode('utf-8', 'surrogatepass')
+    keys = names.translate(DIGITS_TO_PLACEHOLDER).split(b'\0')
+    digits = names.translate(None, NOT_DIGITS).split(b'\0')
+    return keys, digits
+
+
+def group_by_pattern(files):
+    """Group the digits of file names by pattern key.
+
+    >>> group_by_pattern(["a1.png", "b.png", "a2.png"])
+    {'a\\x01.png': [b'1', b'2'], 'b.png': [b'']}
+    """
+    keys, digits = split_names(files)
+    unique_keys = dict.fromkeys(keys)
+    if len(unique_keys) == 1:
+        groups = {key: digits for key in unique_keys}
+    else:
+        groups = defaultdict(list)
+        for key, number in zip(keys, digits):
+            groups[key].append(number)
+    return {key.decode('utf-8', 'surrogatepass'): group for key, group in groups.items()}
+
+
+def sorted_values(digits):
+    """Return the values of a group's fixed width digits in order.
+
+    >>> sorted_values([b'0102', b'0003', b'0101', b'1000'])
+    [3, 101, 102, 1000]
+    """
+    width = len(digits[0])
+    if width > MAX_INT64_DIGITS:
+        return sorted(map(int, digits))
+    table = np.frombuffer(b''.join(digits), dtype=np.uint8).reshape(len(digits), width)
+    values = (table - ord('0')).astype(np.int64) @ 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    values.sort()
+    return values.tolist()
+
+
+def pattern_writer(key):
+    """Return the digit widths of key and a function writing a name from its value.
+
+    >>> widths, write = pattern_writer('shot\\x01\\x01_\\x01\\x01\\x01.png')
+    >>> widths, write(1007)
+    ([2, 3], 'shot01_007.png')
+    """
+    widths = [len(match.group()) for match in placeholder_regex.finditer(key)]
+    literals = placeholder_regex.split(key)
+    fields = [slice(start, start + width)
+              for start, width in zip(accumulate([0] + widths), widths)]
+    total = sum(widths)
+
+    def write(value):
+        digits = '%0*d' % (total, value)
+        parts = [literals[0]]
+        for field, literal in zip(fields, literals[1:]):
+            parts += digits[field], literal
+        return ''.join(parts)
+    return widths, write
+
+
+def find_runs(items, widths, value=int, max_gap=MAX_GAP):
+    """Split sorted items into runs where one numeric field counts up.
+
+    value(item) returns the pattern value of an item. The counting field is
+    the first one that differs between the first two entries of a run, all
+    other fields have to stay the same. Frames may be skipped, a jump of
+    more than max_gap frames starts a new run.
+    Yields (position of first entry, index of the counting field, frames),
+    frames is None for entries that are not part of a sequence.
+
+    >>> for run in find_runs([11, 12, 13, 21, 31, 35, 50], [1, 1]): print(run)
+    (0, 1, range(1, 4))
+    (3, 0, [2, 3])
+    (5, None, None)
+    (6, None, None)
+    """
+    weights = [10 ** sum(widths[i + 1:]) for i in range(len(widths))]
+    count = len(items)
+    start = 0
+    while start < count:
+        first = value(items[start])
+        if start + 1 == count:
+            yield start, None, None
+            return
+
+        # Most significant field that changed between the first two entries
+        second = value(items[start + 1])
+        for segment, weight in enumerate(weights):
+            if first // weight != second // weight:
+                break
+        size = 10 ** widths[segment]
+        field = first // weight % size
+        others = (first // (weight * size), first % weight)
+
+        length = 1
+        if weight == 1:
+            # Values are sorted and unique, so a stretch without gaps goes on
+            # exactly as long as value(items[start + i]) - first == i.
+            # Bisect for its end, counting beyond the field width would carry.
+            low, high = 1, min(size - field, count - start)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if value(items[start + middle - 1]) - first == middle - 1:
+                    low = middle
+                else:
+                    high = middle - 1
+            length = low
+
+        # Continue over steps and gaps one entry at a time
+        frames = []
+        last = field + length - 1
+        position = start + length
+        while position < count:
+            current = value(items[position])
+            frame = current // weight % size
+            if (current // (weight * size), current % weight) != others or frame - last > max_gap:
+                break
+            frames.append(frame)
+            last = frame
+            position += 1
+
+        if frames:
+            frames[:0] = range(field, field + length)
+        else:
+            frames = range(field, field + length)
+
+        if len(frames) > 1:
+            yield start, segment, frames
+        else:
+            yield start, None, None
+        start += len(frames)
+
+
+def find_image_sequences(files, cache=None, max_gap=MAX_GAP):
+    """From a group of files, detect image sequences.
+
+    This returns a generator of FrameRange tuples with the first filename,
+    the first and last frame, the frame step, the digit count of the frame
+    number and the missing frames as (first, last) pairs.
+    Files that are not part of a sequence are single frame ranges, a frame
+    jump above max_gap splits a sequence.
+    The grouping is looked up in / stored to cache (a ProbeCache) if given.
+
+    >>> for sequence in find_image_sequences([
+    ...         "test2-001.jp2", "test2-002.jp2",
+    ...         "test3-003.jp2", "test3-004.jp2", "test3-005.jp2", "test3-006.jp2",
+    ...         "twos.01.png", "twos.03.png", "twos.05.png", "twos.09.png",
+    ...         "blaah"]):
+    ...     print(sequence)
+    FrameRange(filename='blaah', start=1, end=1, step=1, padding=0, missing=())
+    FrameRange(filename='test2-001.jp2', start=1, end=2, step=1, padding=3, missing=())
+    FrameRange(filename='test3-003.jp2', start=3, end=6, step=1, padding=3, missing=())
+    FrameRange(filename='twos.01.png', start=1, end=9, step=2, padding=2, missing=((7, 7),))
+
+    """
+    if cache is None:
+        yield from _detect_sequences(files, max_gap)
+        return
+
+    files = sorted(files)
+    sequences = cache.get_sequences(files, max_gap)
+    if sequences is None:
+        sequences = _detect_sequences(files, max_gap)
+        cache.put_sequences(files, max_gap, sequences)
+    else:
+        sequences = [FrameRange(filename, start, end, step, padding, tuple(map(tuple, missing)))
+                     for filename, start, end, step, padding, missing in sequences]
+    yield from sequences
+
+
+def _detect_sequences(files, max_gap=MAX_GAP):
+    '''find_image_sequences as a list'''
+    if not isinstance(files, list):
+        files = list(files)
+
+    found = []
+    for key, digits in group_by_pattern(files).items():
+        if DIGIT not in key:
+            found.extend(FrameRange.single(key) for _name in digits)
+            continue
+        widths, write = pattern_writer(key)
+        if len(digits) == 1:
+            found.append(FrameRange.single(write(int(digits[0]))))
+            continue
+
+        values = sorted_values(digits)
+        for position, segment, frames in find_runs(values, widths, max_gap=max_gap):
+            if frames is None:
+                found.append(FrameRange.single(write(values[position])))
+            else:
+                found.append(FrameRange.from_frames(write(values[position]), frames, widths[segment]))
+
+    found.sort()
+    return found
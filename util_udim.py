@@ -0,0 +1,151 @@
+'''put many images on the tiles of one UDIM image'''
+
+import hashlib
+import os
+import shutil
+
+import bpy
+
+from .util_load_images import ImageSpec
+from .util_memory import manage_image
+from .util_probe_cache import addon_cache_dir
+
+UDIM_MIN_VERSION = (2, 82, 0)  # tiled images
+UDIM_TOKEN_VERSION = (2, 93, 0)  # <UDIM> in file paths
+FIRST_TILE = 1001
+TILES_PER_ROW = 10
+MAX_TILES = 1000
+TILE_FOLDER = 'UDIM'  # next to the .blend, holds a directory per set of tiles
+
+
+def tile_number(index):
+    '''UDIM number of the index-th tile, rows of TILES_PER_ROW'''
+    return FIRST_TILE + index
+
+
+def udim_uv_rect(tile):
+    """(u0, v0, u1, v1) of a UDIM tile.
+
+    >>> udim_uv_rect(1001), udim_uv_rect(1012)
+    ((0, 0, 1, 1), (1, 1, 2, 2))
+    """
+    row, column = divmod(tile - FIRST_TILE, TILES_PER_ROW)
+    return column, row, column + 1, row + 1
+
+
+def can_use_tile(img_spec):
+    '''single frame image files with a known size'''
+    return (img_spec.image.source == 'FILE'
+            and img_spec.frame_duration == 1
+            and img_spec.size is not None
+            and bool(img_spec.image.filepath))
+
+
+def source_path(img_spec):
+    image = img_spec.image
+    return os.path.normpath(bpy.path.abspath(image.filepath, library=image.library))
+
+
+def tiles_digest(paths):
+    '''name of the tile directory of paths, changes with the files'''
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(('%s\0%d\0%d\0' % (path, stat.st_mtime_ns, stat.st_size)).encode())
+    return digest.hexdigest()
+
+
+def tile_folder(location):
+    """Folder holding the tile directories for an import.
+
+    'BLEND' puts them in a UDIM folder next to the saved .blend, so they
+    move with the project, 'CACHE' and unsaved files use the add-on's
+    cache directory. Source folders are never written to.
+    """
+    if location == 'BLEND' and bpy.data.filepath:
+        return os.path.join(os.path.dirname(bpy.data.filepath), TILE_FOLDER)
+    return os.path.join(addon_cache_dir(), 'udim')
+
+
+def tile_directory(folder, paths):
+    '''directory in folder for one set of tiles, the same files get the same one'''
+    directory = os.path.join(folder, tiles_digest(paths))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def link_tile(source, destination):
+    '''hard link source as destination, copy across file systems'''
+    if os.path.exists(destination):
+        if os.path.samefile(source, destination):
+            return
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def pack_udims(img_specs, folder, name='UDIM'):
+    """Put the images of img_specs on the tiles of as few UDIM images as possible.
+
+    Tiles keep their files, they are linked under UDIM names into a
+    directory in folder (see tile_folder). Images are left over when it
+    can't be written. Tile directories are never removed automatically,
+    saved files may still use them. A tiled image has one color space and
+    file name pattern, so byte and float images and file types go into
+    separate UDIM images.
+    Returns ([(UDIM ImageSpec, [(img_spec, tile)])], img_specs that can't
+    be tiles).
+    """
+    leftovers = [spec for spec in img_specs if not can_use_tile(spec)]
+    # Specs sharing an image share its tile
+    shared = {}
+    for spec in img_specs:
+        if can_use_tile(spec):
+            shared.setdefault(spec.image.name, []).append(spec)
+    groups = {}
+    for spec, *_others in shared.values():
+        is_float = (spec.bit_depth or 8) > 8
+        extension = os.path.splitext(spec.image.filepath)[1].lower()
+        groups.setdefault((is_float, extension), []).append(spec)
+
+    udims = []
+    for (_is_float, extension), specs in groups.items():
+        for start in range(0, len(specs), MAX_TILES):
+            members = specs[start:start + MAX_TILES]
+            try:
+                udim_spec = build_udim(folder, name, members, extension)
+            except OSError:
+                leftovers.extend(other for spec in members for other in shared[spec.image.name])
+                continue
+            tiles = [(other, tile_number(index))
+                     for index, spec in enumerate(members) for other in shared[spec.image.name]]
+            udims.append((udim_spec, tiles))
+    return udims, leftovers
+
+
+def build_udim(folder, name, members, extension):
+    '''create one tiled image with a tile per img_spec of members'''
+    sources = [source_path(spec) for spec in members]
+    directory = tile_directory(folder, sources)
+    for index, source in enumerate(sources):
+        destination = os.path.join(directory, '%s.%d%s' % (name, tile_number(index), extension))
+        link_tile(source, destination)
+
+    image = bpy.data.images.load(
+        os.path.join(directory, '%s.%d%s' % (name, FIRST_TILE, extension)))
+    image.name = name
+    image.source = 'TILED'
+    if bpy.app.version >= UDIM_TOKEN_VERSION:
+        image.filepath = os.path.join(directory, '%s.<UDIM>%s' % (name, extension))
+    for index in range(1, len(members)):
+        image.tiles.new(tile_number=tile_number(index))
+    image.reload()
+    use_alpha = any(spec.use_alpha for spec in members)
+    image.use_alpha = use_alpha
+    manage_image(image)
+
+    first = members[0]
+    udim_spec = ImageSpec(image, first.size, 1, 0, 1, use_alpha, first.channels, first.bit_depth)
+    return udim_spec